@@ -0,0 +1,90 @@
+import os
+import pygame
+
+# sprites, collision masks and fonts shared by flappy_bird.py and train.py.
+# Nothing is loaded at import time: each asset is built the first time it
+# is asked for and then kept, so processes that never draw (workers, the
+# numpy simulator) never decode the background or open a font.
+
+IMG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'imgs')
+
+_cache = {}
+
+def _memo(key, build):
+    try:
+        return _cache[key]
+    except KeyError:
+        value = _cache[key] = build()
+        return value
+
+
+def image(name):
+    # a sprite from imgs/, scaled up 2x like everything in the game
+    return _memo(('image', name), lambda: pygame.transform.scale2x(
+        pygame.image.load(os.path.join(IMG_DIR, name))))
+
+
+def bird_imgs():
+    # wing frames, indexed by Bird.frame
+    return _memo('bird_imgs', lambda: [image('bird1.png'), image('bird2.png'), image('bird3.png')])
+
+
+def pipe_img():
+    return image('pipe.png')
+
+
+def pipe_top_img():
+    return _memo('pipe_top_img', lambda: pygame.transform.flip(pipe_img(), False, True))
+
+
+def base_img():
+    return image('base.png')
+
+
+def bg_img():
+    return image('bg.png')
+
+
+# one mask per wing frame and per pipe orientation, so collision checks
+# only have to run the overlap test
+
+def bird_masks():
+    return _memo('bird_masks', lambda: [pygame.mask.from_surface(img) for img in bird_imgs()])
+
+
+def pipe_top_mask():
+    return _memo('pipe_top_mask', lambda: pygame.mask.from_surface(pipe_top_img()))
+
+
+def pipe_bottom_mask():
+    return _memo('pipe_bottom_mask', lambda: pygame.mask.from_surface(pipe_img()))
+
+
+def font(name, size):
+    # a font file (or pygame's bundled freesansbold.ttf)
+    def build():
+        if not pygame.font.get_init():
+            pygame.font.init()
+        return pygame.font.Font(name, size)
+    return _memo(('font', name, size), build)
+
+
+def sys_font(name, size):
+    # a font installed on the system, looked up by name
+    def build():
+        if not pygame.font.get_init():
+            pygame.font.init()
+        return pygame.font.SysFont(name, size)
+    return _memo(('sys_font', name, size), build)
+
+
+def rotated_bird(frame, tilt):
+    # wing frame `frame` turned by `tilt` degrees. Tilt only ever changes in
+    # steps of physics.ROT_VEL, so there are only a few dozen of these and
+    # drawing a bird never has to rotate anything after the first time.
+    def build():
+        img = pygame.transform.rotate(bird_imgs()[frame], tilt)
+        if pygame.display.get_surface() is not None:
+            img = img.convert_alpha() # blits faster in the display's pixel format
+        return img
+    return _memo(('rotated_bird', frame, tilt), build)
@@ -0,0 +1,132 @@
+import numpy as np
+from neat.graphs import feed_forward_layers
+
+
+class BatchNetwork:
+    # all of a generation's feed forward networks compiled into flat numpy
+    # arrays, so one call evaluates every living bird's network at once.
+    #
+    # Every node of every genome gets a slot in one value vector. Nodes are
+    # grouped by their layer in their own network; a layer only reads slots
+    # of earlier layers, so each layer across all genomes is a single
+    # weighted bincount followed by the activation.
+    #
+    # With copies > 1 every network is there that many times, each copy with
+    # its own values, so the same genomes can fly several episodes in one
+    # pass: network c * len(genomes) + j is copy c of genomes[j].
+
+    def __init__(self, genomes, config, copies=1):
+        genome_config = config.genome_config
+        input_keys = genome_config.input_keys
+        output_keys = genome_config.output_keys
+
+        num_slots = 0
+        in_slots = []
+        out_slots = []
+        levels = [] # per layer: node rows and edge rows, see _add_layer
+
+        for j, genome in enumerate(genomes):
+            slot = {}
+            for k in input_keys + output_keys:
+                slot[k] = num_slots
+                num_slots += 1
+
+            connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+            layers = feed_forward_layers(input_keys, output_keys, connections)
+            for depth, layer in enumerate(layers):
+                if depth == len(levels):
+                    levels.append(([], []))
+                nodes, edges = levels[depth]
+                for node in layer:
+                    if node not in slot:
+                        slot[node] = num_slots
+                        num_slots += 1
+
+                for node in layer:
+                    ng = genome.nodes[node]
+                    if ng.activation != 'tanh' or ng.aggregation != 'sum':
+                        raise ValueError("BatchNetwork only supports tanh activation with sum "
+                                         "aggregation, node {0} uses {1}/{2}".format(
+                                             node, ng.activation, ng.aggregation))
+                    nodes.append((slot[node], ng.bias, ng.response, j))
+                    # connections in the same order FeedForwardNetwork sums them
+                    for inode, onode in connections:
+                        if onode == node:
+                            edges.append((slot[inode], len(nodes) - 1,
+                                          genome.connections[(inode, onode)].weight, j))
+
+            in_slots.append([slot[k] for k in input_keys])
+            out_slots.append([slot[k] for k in output_keys])
+
+        self.values = np.zeros(num_slots * copies)
+        in_slots = np.array(in_slots, dtype=np.int64).reshape(len(genomes), len(input_keys))
+        out_slots = np.array(out_slots, dtype=np.int64).reshape(len(genomes), len(output_keys))
+        self.in_slots = self._tile(in_slots, copies, num_slots)
+        self.out_slots = self._tile(out_slots, copies, num_slots)
+        self.levels = []
+        for nodes, edges in levels:
+            level = self._add_layer(nodes, edges)
+            num_nodes = len(level['slot'])
+            for name, step in (('slot', num_slots), ('genome', len(genomes)), ('src', num_slots),
+                               ('dst', num_nodes), ('edge_genome', len(genomes))):
+                level[name] = self._tile(level[name], copies, step)
+            for name in ('bias', 'response', 'weight'):
+                level[name] = np.tile(level[name], copies)
+            self.levels.append(level)
+        self.active = len(genomes) * copies
+
+    @staticmethod
+    def _tile(a, copies, step):
+        # a repeated `copies` times along the first axis, copy c shifted by c * step
+        if copies == 1:
+            return a
+        return np.concatenate([a + c * step for c in range(copies)])
+
+    @staticmethod
+    def _add_layer(nodes, edges):
+        nodes = np.array(nodes, dtype=np.float64).reshape(-1, 4)
+        edges = np.array(edges, dtype=np.float64).reshape(-1, 4)
+        return {
+            'slot': nodes[:, 0].astype(np.int64),
+            'bias': nodes[:, 1],
+            'response': nodes[:, 2],
+            'genome': nodes[:, 3].astype(np.int64),
+            'src': edges[:, 0].astype(np.int64),
+            'dst': edges[:, 1].astype(np.int64),
+            'weight': edges[:, 2],
+            'edge_genome': edges[:, 3].astype(np.int64),
+        }
+
+    def _compact(self, idx):
+        # drop the nodes and connections of genomes that aren't in idx anymore
+        keep = np.zeros(len(self.in_slots), dtype=bool)
+        keep[idx] = True
+        for level in self.levels:
+            node_keep = keep[level['genome']]
+            edge_keep = keep[level['edge_genome']]
+            # renumber the edge targets to the surviving node rows
+            new_row = np.cumsum(node_keep) - 1
+            for name in ('slot', 'bias', 'response', 'genome'):
+                level[name] = level[name][node_keep]
+            for name in ('src', 'weight', 'edge_genome'):
+                level[name] = level[name][edge_keep]
+            level['dst'] = new_row[level['dst'][edge_keep]]
+        self.active = len(idx)
+
+    def activate(self, idx, inputs):
+        # outputs of the networks of genomes idx (indexes into the list passed
+        # to the constructor, or network numbers with copies) for one row of
+        # inputs each. idx may only shrink
+        # between calls, genomes left out are eventually compiled away.
+        if len(idx) <= self.active // 2:
+            self._compact(idx)
+
+        values = self.values
+        values[self.in_slots[idx]] = inputs
+        for level in self.levels:
+            s = np.bincount(level['dst'], weights=values[level['src']] * level['weight'],
+                            minlength=len(level['slot']))
+            # same as neat's tanh_activation: tanh(2.5 * z) with z clamped
+            z = np.clip(2.5 * (level['bias'] + level['response'] * s), -60.0, 60.0)
+            values[level['slot']] = np.tanh(z)
+        return values[self.out_slots[idx]]
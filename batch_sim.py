@@ -0,0 +1,253 @@
+import numpy as np
+
+from episode import PipeStream, new_seed
+from physics import (TRAIN, BIRD_START_X, BIRD_START_Y, PIPE_START_X, FLOOR,
+                     MAX_ROTATION, ROT_VEL, ANIMATION_TIME, Pipe)
+
+# wing frame shown for each value of img_count, same sequence as Bird.animate
+FRAME_OF_COUNT = np.array([0] * ANIMATION_TIME + [1] * ANIMATION_TIME +
+                          [2] * ANIMATION_TIME + [1] * ANIMATION_TIME + [0])
+
+
+class BirdArrays:
+    # n birds as numpy arrays, with the physics of physics.Bird applied to
+    # the birds idx at once. Shared by BatchSim and env.FlappyEnv.
+
+    def __init__(self, n, bird_masks, profile=TRAIN):
+        self.profile = profile # physics.Profile the birds fly with
+        self.bird_masks = bird_masks # collision masks, one per wing frame
+        self.bird_w, self.bird_h = bird_masks[0].get_size()
+
+        self.y = np.full(n, float(BIRD_START_Y))
+        self.vel = np.zeros(n)
+        self.tick_count = np.zeros(n, dtype=np.int64)
+        self.height = np.full(n, float(BIRD_START_Y))
+        self.tilt = np.zeros(n, dtype=np.int64)
+        self.img_count = np.zeros(n, dtype=np.int64)
+        self.frame = np.zeros(n, dtype=np.int64)
+
+    def reset_birds(self, idx):
+        # birds idx back to where a new Bird starts
+        self.y[idx] = BIRD_START_Y
+        self.vel[idx] = 0
+        self.tick_count[idx] = 0
+        self.height[idx] = BIRD_START_Y
+        self.tilt[idx] = 0
+        self.img_count[idx] = 0
+        self.frame[idx] = 0
+
+    def move(self, idx):
+        profile = self.profile
+        self.tick_count[idx] += 1
+        t = self.tick_count[idx]
+        d = self.vel[idx] * t + profile.gravity * t ** 2
+        d = np.where(d >= profile.terminal_dist, profile.terminal_dist, d)
+        d = np.where(d < 0, d - profile.jump_boost, d)
+
+        y = self.y[idx] + d
+        self.y[idx] = y
+
+        tilt = self.tilt[idx]
+        up = (d < 0) | (y < self.height[idx] + 50)
+        self.tilt[idx] = np.where(up, np.maximum(tilt, MAX_ROTATION),
+                                  np.where(tilt > -90, tilt - ROT_VEL, tilt))
+
+    def jump(self, idx):
+        self.vel[idx] = self.profile.jump_vel
+        self.tick_count[idx] = 0
+        self.height[idx] = self.y[idx]
+
+    def animate(self, idx):
+        count = self.img_count[idx] + 1
+        frame = FRAME_OF_COUNT[count]
+        count[count == ANIMATION_TIME * 4] = 0
+
+        falling = self.tilt[idx] <= -80 # only one frame while diving
+        frame[falling] = 1
+        count[falling] = ANIMATION_TIME * 2
+
+        self.img_count[idx] = count
+        self.frame[idx] = frame
+
+
+class BatchSim(BirdArrays):
+    # struct of arrays version of the training loop: every bird's state lives
+    # in numpy arrays and each tick is a handful of whole array operations.
+    #
+    # pipes may also be a list of PipeStreams, one per episode, to fly n
+    # birds through each of them at once: bird k * n + j is bird j of
+    # episode k. Pipes move and spawn at the same ticks in every episode, so
+    # all episodes share the pipe positions and only the heights differ.
+
+    def __init__(self, n, bird_masks, top_mask, bottom_mask, pipes=None, profile=TRAIN):
+        if pipes is None:
+            pipes = PipeStream(new_seed())
+        if not isinstance(pipes, (list, tuple)):
+            pipes = [pipes]
+        self.pipes = pipes # PipeStream of each episode
+        self.heights = [iter(stream) for stream in pipes]
+        self.episodes = len(pipes)
+        self.episode = np.repeat(np.arange(self.episodes), n) # which episode each bird flies
+        n *= self.episodes
+        self.n = n
+        BirdArrays.__init__(self, n, bird_masks, profile)
+
+        # collision masks of the two pipe orientations
+        self.top_mask = top_mask
+        self.bottom_mask = bottom_mask
+        self.pipe_w, self.pipe_h = top_mask.get_size()
+
+        self.alive = np.ones(n, dtype=bool)
+        self.fitness = np.zeros(n)
+
+        # only a few pipes are ever on screen, plain lists are enough. Each
+        # pipe_height is an array with the pipe's height in every episode.
+        self.pipe_x = []
+        self.pipe_height = []
+        self.pipe_passed = []
+        self.add_pipe()
+
+        self.score = np.zeros(self.episodes, dtype=np.int64) # pipes passed in each episode
+        self.ticks = 0
+        self.bird_ticks = 0 # living birds summed over the ticks
+        self.profiler = None # profiler.PhaseProfiler timing each phase of tick, if set
+        self.recorder = None # replay.BatchRecorder writing the jumps and deaths, if set
+
+        # pixel tests run and skipped by the broad phase in collide, per pipe half
+        self.narrow_checks = 0
+        self.skipped_checks = 0
+
+    def add_pipe(self):
+        self.pipe_x.append(PIPE_START_X)
+        self.pipe_height.append(np.array([next(h) for h in self.heights]))
+        self.pipe_passed.append(False)
+
+    def pipe_index(self):
+        # the pipe the birds are looking at: the first one they haven't cleared
+        if len(self.pipe_x) > 1 and BIRD_START_X > self.pipe_x[0] + self.pipe_w:
+            return 1
+        return 0
+
+    def collide(self, idx, p):
+        # pixel perfect test of birds idx against pipe p, only for the pipe
+        # halves whose bounding box actually overlaps a bird's
+        x = self.pipe_x[p]
+        hit = np.zeros(len(idx), dtype=bool)
+        if x >= BIRD_START_X + self.bird_w or x + self.pipe_w <= BIRD_START_X:
+            self.skipped_checks += 2 * len(idx)
+            return hit
+
+        height = self.pipe_height[p][self.episode[idx]]
+        top = height - self.pipe_h
+        bottom = height + Pipe.GAP
+        ry = np.round(self.y[idx]).astype(np.int64)
+        near_top = (ry < height) & (ry + self.bird_h > top)
+        near_bottom = (ry < bottom + self.pipe_h) & (ry + self.bird_h > bottom)
+        tested = int(near_top.sum() + near_bottom.sum())
+        self.narrow_checks += tested
+        self.skipped_checks += 2 * len(idx) - tested
+
+        for i in np.flatnonzero(near_top | near_bottom):
+            mask = self.bird_masks[self.frame[idx[i]]]
+            if ((near_bottom[i] and mask.overlap(self.bottom_mask, (x - BIRD_START_X, int(bottom[i] - ry[i])))) or
+                    (near_top[i] and mask.overlap(self.top_mask, (x - BIRD_START_X, int(top[i] - ry[i]))))):
+                hit[i] = True
+        return hit
+
+    def inputs(self, idx):
+        # the three network inputs for birds idx: y and the distances to the
+        # top and bottom of the upcoming pipe opening
+        p = self.pipe_index()
+        height = self.pipe_height[p][self.episode[idx]]
+        top = height - self.pipe_h
+        bottom = height + Pipe.GAP
+        y = self.y[idx]
+        return np.column_stack((y, np.abs(y - top), np.abs(y - bottom)))
+
+    def tick(self, decide):
+        # advance every living bird one frame; decide(idx, inputs) returns a
+        # bool array saying which of the birds idx jump. Returns False once
+        # all birds are dead.
+        prof = self.profiler
+        rec = self.recorder
+        if prof:
+            prof.mark()
+        idx = np.flatnonzero(self.alive)
+        if len(idx) == 0:
+            return False
+        flying = idx
+
+        self.ticks += 1
+        self.bird_ticks += len(idx)
+        if prof:
+            prof.tick(len(idx))
+        self.move(idx)
+        self.fitness[idx] += 0.1
+        if prof:
+            prof.lap('move')
+        jumping = np.asarray(decide(idx, self.inputs(idx)), dtype=bool)
+        self.jump(idx[jumping])
+        if rec:
+            rec.jump(idx[jumping])
+        if prof:
+            prof.lap('activate')
+
+        passed = None # episodes that passed a pipe this tick
+        for p in range(len(self.pipe_x)):
+            if len(idx):
+                if prof:
+                    prof.lap('pipes')
+                    prof.collisions += len(idx)
+                hit = self.collide(idx, p)
+                if prof:
+                    prof.lap('collide')
+                # birds that hit a pipe lose a point so ones that made it
+                # the same distance without crashing rank higher
+                self.fitness[idx[hit]] -= 1
+                self.alive[idx[hit]] = False
+                if rec:
+                    rec.die(idx[hit])
+
+                if not self.pipe_passed[p] and self.pipe_x[p] < BIRD_START_X:
+                    # passed in every episode that still had birds at this pipe
+                    self.pipe_passed[p] = True
+                    passed = np.bincount(self.episode[idx], minlength=self.episodes) > 0
+                idx = idx[~hit]
+
+        # pipes that left the screen, then scroll everything left
+        gone = [p for p, x in enumerate(self.pipe_x) if x + self.pipe_w < 0]
+        self.pipe_x = [x - Pipe.VEL for x in self.pipe_x]
+
+        if passed is not None:
+            # reward birds that made it through a pipe without colliding
+            self.fitness[idx] += 5
+            self.score[passed] += 1
+            self.add_pipe()
+
+        for p in reversed(gone):
+            del self.pipe_x[p]
+            del self.pipe_height[p]
+            del self.pipe_passed[p]
+        if prof:
+            prof.lap('pipes')
+
+        # hitting the ground or flying over the screen
+        y = self.y[idx]
+        out = (y + self.bird_h >= FLOOR) | (y < 0)
+        self.alive[idx[out]] = False
+        if rec:
+            rec.die(idx[out])
+        idx = idx[~out]
+        if prof:
+            prof.lap('bounds')
+
+        self.animate(idx)
+        if rec:
+            rec.end_tick(flying)
+        if prof:
+            prof.lap('animate')
+        return True
+
+    def stop(self, episode):
+        # end an episode early, its birds keep the fitness they have
+        self.alive[self.episode == episode] = False
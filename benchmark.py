@@ -0,0 +1,258 @@
+import neat
+import numpy as np
+from batch_net import BatchNetwork
+from batch_sim import BatchSim
+from env import FlappyEnv
+from episode import PipeStream
+from physics import Bird, Pipe, PipeRing, TRAIN, BIRD_START_X, PIPE_START_X, PIPE_WIDTH
+import assets
+import train
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import sys
+import time
+import argparse
+
+# throughput of the training hot path, so regressions show up as numbers.
+# Everything runs headless on fixed seeds; each measurement is the best of
+# a few repeats. Results are written as JSON and can be compared against a
+# saved run:
+#
+#   python benchmark.py --out baseline.json
+#   ... change things ...
+#   python benchmark.py --compare baseline.json
+
+SEED = 1234
+SIZES = (1, 10, 100, 1000, 10000)
+BIRD_TICKS = 200000 # bird ticks per physics measurement, spread over the ticks
+ENV_STEPS = 200000 # environment steps per env measurement
+GENERATIONS = 10 # generations timed through train.run, a fresh population dies in a few ticks
+GENERATION_MAX_TICKS = 3000 # so a lucky population can't make a generation endless
+
+local_dir = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(local_dir, 'config-feedforward.txt')
+
+
+def load_config():
+    return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                              neat.DefaultSpeciesSet, neat.DefaultStagnation, CONFIG_PATH)
+
+
+def ticks_for(n):
+    return max(20, min(2000, BIRD_TICKS // n))
+
+
+def best_of(repeat, setup):
+    # fastest of `repeat` runs, in seconds. setup() builds a fresh run and
+    # returns the function to time, so every repeat starts from the same state.
+    best = None
+    for _ in range(repeat):
+        fn = setup()
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def start_heights(n):
+    # spread the birds over the screen so they don't all take the same path
+    rng = random.Random(SEED)
+    return [rng.randrange(150, 550) for _ in range(n)]
+
+
+def physics_objects(n, ticks):
+    # Bird.move and Pipe.collide for n birds. Nobody is removed, so every
+    # tick costs n birds; a bird jumps when it drops below the gap.
+    birds = [Bird(BIRD_START_X, y, TRAIN) for y in start_heights(n)]
+    heights = iter(PipeStream(SEED))
+    pipes = PipeRing(heights)
+    pipes.spawn(PIPE_START_X)
+
+    def run():
+        for _ in range(ticks):
+            pipe = pipes[0] if pipes[0].x + PIPE_WIDTH > BIRD_START_X else pipes[-1]
+            gap = pipe.height + Pipe.GAP / 2
+            for bird in birds:
+                bird.move()
+                if bird.y > gap:
+                    bird.jump()
+            for pipe in pipes:
+                for bird in birds:
+                    pipe.collide(bird)
+                pipe.move()
+            if pipes[-1].x < PIPE_START_X - 300:
+                pipes.spawn(PIPE_START_X)
+            if pipes[0].off_screen():
+                pipes.release()
+            for bird in birds:
+                bird.animate()
+    return run
+
+
+def physics_batch(n, ticks):
+    # the same with BatchSim, dead birds are brought back every tick
+    sim = BatchSim(n, assets.bird_masks(), assets.pipe_top_mask(),
+                   assets.pipe_bottom_mask(), PipeStream(SEED))
+    sim.y[:] = start_heights(n)
+
+    def decide(idx, inputs):
+        p = sim.pipe_index()
+        return sim.y[idx] > sim.pipe_height[p] + Pipe.GAP / 2
+
+    def run():
+        for _ in range(ticks):
+            sim.tick(decide)
+            sim.alive[:] = True
+    return run
+
+
+def bench_physics(sizes, repeat, results):
+    for n in sizes:
+        ticks = ticks_for(n)
+        for name, build in (('physics', physics_objects), ('physics_batch', physics_batch)):
+            seconds = best_of(repeat, lambda: build(n, ticks))
+            results['{0}_ticks_per_sec_{1}'.format(name, n)] = {
+                'value': ticks / seconds, 'unit': 'ticks/s', 'better': 'higher'}
+            print("{0:>14} {1:>6} birds: {2:10.0f} ticks/s  {3:12.0f} bird ticks/s".format(
+                name, n, ticks / seconds, ticks * n / seconds))
+
+
+def bench_env(sizes, repeat, results):
+    # FlappyEnv steps per second with n environments, each jumping when it
+    # gets close to the bottom of the gap. Environments crash and reset all
+    # the time, which is part of what is measured.
+    for n in sizes:
+        steps = max(20, ENV_STEPS // n)
+
+        def setup():
+            env = FlappyEnv(n)
+            obs = [env.reset(SEED)]
+
+            def run():
+                for _ in range(steps):
+                    obs[0] = env.step(obs[0][:, 2] < 90)[0]
+            return run
+
+        rate = steps * n / best_of(repeat, setup)
+        results['env_steps_per_sec_{0}'.format(n)] = {
+            'value': rate, 'unit': 'steps/s', 'better': 'higher'}
+        print("{0:>14} {1:>6} envs:  {2:10.0f} steps/s".format('env', n, rate))
+
+
+def random_genomes(config, n):
+    rng_state = random.getstate()
+    random.seed(SEED)
+    genomes = []
+    for i in range(n):
+        g = config.genome_type(i)
+        g.configure_new(config.genome_config)
+        genomes.append(g)
+    random.setstate(rng_state)
+    return genomes
+
+
+def bench_activation(sizes, repeat, results):
+    # network activations per second, one FeedForwardNetwork per genome vs
+    # one BatchNetwork pass over all of them
+    config = load_config()
+    for n in sizes:
+        genomes = random_genomes(config, n)
+        inputs = np.random.RandomState(SEED).uniform(0, 800, (n, 3))
+        rows = inputs.tolist()
+        nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+        batch = BatchNetwork(genomes, config)
+        idx = np.arange(n)
+        passes = max(1, BIRD_TICKS // 10 // n)
+
+        def objects():
+            for _ in range(passes):
+                for net, row in zip(nets, rows):
+                    net.activate(row)
+
+        def batched():
+            for _ in range(passes):
+                batch.activate(idx, inputs)
+
+        for name, fn in (('activate', objects), ('activate_batch', batched)):
+            seconds = best_of(repeat, lambda: fn)
+            rate = passes * n / seconds
+            results['{0}_per_sec_{1}'.format(name, n)] = {
+                'value': rate, 'unit': 'activations/s', 'better': 'higher'}
+            print("{0:>14} {1:>6} nets:  {2:10.0f} activations/s".format(name, n, rate))
+
+
+def bench_generation(repeat, results):
+    # whole generations through train.run from a fresh population, as
+    # seconds per generation
+    for name, vectorized in (('generation', False), ('generation_vectorized', True)):
+        def run():
+            random.seed(SEED)
+            with contextlib.redirect_stdout(io.StringIO()):
+                train.run(CONFIG_PATH, headless=True, vectorized=vectorized, generations=GENERATIONS,
+                          episode_seed=SEED, max_ticks=GENERATION_MAX_TICKS, champion_path='')
+        seconds = best_of(repeat, lambda: run) / GENERATIONS
+        results[name + '_seconds'] = {'value': seconds, 'unit': 's', 'better': 'lower'}
+        print("{0:>22}: {1:8.3f} s".format(name, seconds))
+
+
+def compare(results, baseline, tolerance):
+    # print each result against the baseline; True if none got worse by
+    # more than tolerance (a fraction)
+    ok = True
+    print()
+    print("{0:<36} {1:>14} {2:>14} {3:>8}".format('benchmark', 'baseline', 'now', 'change'))
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old, new = baseline[name]['value'], result['value']
+        # speedup > 1 is better whichever way the metric goes
+        speedup = new / old if result['better'] == 'higher' else old / new
+        flag = ''
+        if speedup < 1 - tolerance:
+            flag = '  REGRESSION'
+            ok = False
+        print("{0:<36} {1:>14.4g} {2:>14.4g} {3:>+7.1%}{4}".format(name, old, new, speedup - 1, flag))
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES),
+                        help='population sizes for the physics, activation and env benchmarks')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='runs of each measurement, the fastest counts')
+    parser.add_argument('--only', nargs='+', choices=('physics', 'activation', 'env', 'generation'),
+                        default=('physics', 'activation', 'env', 'generation'),
+                        help='run only some of the benchmarks')
+    parser.add_argument('--out', metavar='PATH', help='write the results to PATH as JSON')
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help='compare against the results saved in BASELINE, exit 1 on a regression')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='slowdown (as a fraction) --compare lets through')
+    args = parser.parse_args()
+
+    results = {}
+    if 'physics' in args.only:
+        bench_physics(args.sizes, args.repeat, results)
+    if 'activation' in args.only:
+        bench_activation(args.sizes, args.repeat, results)
+    if 'env' in args.only:
+        bench_env(args.sizes, args.repeat, results)
+    if 'generation' in args.only:
+        bench_generation(args.repeat, results)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'seed': SEED, 'python': platform.python_version(),
+                       'machine': platform.machine(), 'results': results}, f, indent=1)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,112 @@
+import json
+import math
+import os
+import tempfile
+
+# the trained bird outside of NEAT. export() flattens a genome's network
+# into a small JSON file: the nodes in evaluation order, each with its bias,
+# response, activation, aggregation and incoming links. ChampionNet runs
+# that file with nothing but the standard library, so the game can load a
+# champion without neat, a Config or a Population, and gets exactly the
+# outputs neat.nn.FeedForwardNetwork would.
+
+FORMAT = 1
+
+# where train.py and islands.py save the champion and flappy_bird.py looks
+# for it: next to the scripts, wherever they are run from
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'champion.json')
+
+
+# same functions (and clamping) as neat.activations
+ACTIVATIONS = {
+    'tanh': lambda z: math.tanh(max(-60.0, min(60.0, 2.5 * z))),
+    'sigmoid': lambda z: 1.0 / (1.0 + math.exp(-max(-60.0, min(60.0, 5.0 * z)))),
+    'relu': lambda z: z if z > 0.0 else 0.0,
+    'identity': lambda z: z,
+    'clamped': lambda z: max(-1.0, min(1.0, z)),
+}
+
+
+def _product(values):
+    result = 1.0
+    for v in values:
+        result *= v
+    return result
+
+
+# same as neat.aggregations
+AGGREGATIONS = {
+    'sum': sum,
+    'product': _product,
+    'max': max,
+    'min': min,
+    'mean': lambda values: sum(values) / len(values),
+}
+
+
+def export(genome, config, path):
+    # write genome's network to path. Only the built in activations and
+    # aggregations above can be exported.
+    from neat.graphs import feed_forward_layers
+
+    connections = [cg.key for cg in genome.connections.values() if cg.enabled]
+    inputs = config.genome_config.input_keys
+    outputs = config.genome_config.output_keys
+
+    nodes = []
+    for layer in feed_forward_layers(inputs, outputs, connections):
+        for node in layer:
+            ng = genome.nodes[node]
+            if ng.activation not in ACTIVATIONS or ng.aggregation not in AGGREGATIONS:
+                raise ValueError("can't export node {0}: {1} activation, {2} aggregation".format(
+                    node, ng.activation, ng.aggregation))
+            links = [[i, genome.connections[(i, o)].weight] for i, o in connections if o == node]
+            nodes.append([node, ng.bias, ng.response, ng.activation, ng.aggregation, links])
+
+    data = {'format': FORMAT, 'fitness': genome.fitness, 'inputs': inputs,
+            'outputs': outputs, 'nodes': nodes}
+
+    # written next to its final name and moved into place, like checkpoints
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix='.champion-', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+class ChampionNet:
+    # inference only network loaded from an exported file
+
+    def __init__(self, inputs, outputs, nodes, fitness=None):
+        self.inputs = inputs
+        self.outputs = outputs
+        self.fitness = fitness
+        # (node, activation, aggregation, bias, response, links) in evaluation order
+        self.node_evals = [(node, ACTIVATIONS[act], AGGREGATIONS[agg], bias, response,
+                            [tuple(link) for link in links])
+                           for node, bias, response, act, agg, links in nodes]
+        self.values = dict.fromkeys(inputs + outputs, 0.0)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('format') != FORMAT:
+            raise ValueError("{0} is not a champion file this version can read".format(path))
+        return cls(data['inputs'], data['outputs'], data['nodes'], data.get('fitness'))
+
+    def activate(self, inputs):
+        values = self.values
+        for k, v in zip(self.inputs, inputs):
+            values[k] = v
+
+        for node, act, agg, bias, response, links in self.node_evals:
+            values[node] = act(bias + response * agg([values[i] * w for i, w in links]))
+
+        return [values[k] for k in self.outputs]
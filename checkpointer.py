@@ -0,0 +1,75 @@
+import gzip
+import itertools
+import os
+import pickle
+import random
+import tempfile
+
+import neat
+
+
+class AtomicCheckpointer(neat.Checkpointer):
+    # neat's Checkpointer, but smaller and crash safe:
+    #  - the config isn't stored, it is rebuilt from the config file on resume
+    #  - the file is written next to its final name and moved into place with
+    #    os.replace, so an interrupted write never clobbers the last good one
+    #
+    # A checkpoint's generation is the next one to evaluate, and it names the
+    # file: <prefix><generation>.
+
+    def save_checkpoint(self, config, population, species_set, generation):
+        # called by neat at the end of generation `generation`
+        self.write(population, species_set, generation + 1)
+
+    def write(self, population, species_set, generation):
+        filename = '{0}{1}'.format(self.filename_prefix, generation)
+        print("Saving checkpoint to {0}".format(filename))
+
+        # the species set holds on to every reporter (statistics included),
+        # none of which belongs in the checkpoint
+        reporters = species_set.reporters
+        species_set.reporters = None
+
+        directory = os.path.dirname(os.path.abspath(filename))
+        fd, tmp_path = tempfile.mkstemp(prefix='.checkpoint-', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=5) as f:
+                    data = (generation, population, species_set, random.getstate())
+                    pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.chmod(tmp_path, 0o644) # mkstemp creates the file private
+            os.replace(tmp_path, filename)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        finally:
+            species_set.reporters = reporters
+        return filename
+
+    @staticmethod
+    def restore_checkpoint(filename, config):
+        # rebuild the population saved in filename and put the global random
+        # state back to where it was when the checkpoint was written
+        with gzip.open(filename) as f:
+            generation, population, species_set, rndstate = pickle.load(f)
+        random.setstate(rndstate)
+        p = neat.Population(config, (population, species_set, generation))
+        p.species.reporters = p.reporters
+        # new genome ids have to carry on from the saved ones, and so do new
+        # node ids: neat would otherwise restart them from the nodes of the
+        # first genome to grow one, handing out ids other genomes already use
+        p.reproduction.genome_indexer = itertools.count(max(population) + 1)
+        config.genome_config.node_indexer = itertools.count(max_node_key(p) + 1)
+        return p
+
+
+def max_node_key(p):
+    # the largest node id in the population and its species
+    genomes = list(p.population.values())
+    for s in p.species.species.values():
+        genomes.extend(s.members.values())
+        if s.representative is not None:
+            genomes.append(s.representative)
+    return max(k for g in genomes for k in g.nodes)
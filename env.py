@@ -0,0 +1,235 @@
+import numpy as np
+
+import assets
+from batch_sim import BirdArrays
+from episode import PipeStream, new_seed, SEED_RANGE
+from physics import (TRAIN, BIRD_START_X, BIRD_WIDTH, PIPE_START_X, PIPE_WIDTH, PIPE_HEIGHT,
+                     FLOOR, Pipe)
+
+# the game as a batch of n independent environments with reset() and
+# step(actions), for trainers other than NEAT. Each environment is one bird
+# on its own episode; one step is one tick of train.simulate with the
+# bird's jump decided by the action, and finished games start over on their
+# own.
+#
+# The observation is what the networks see: y and the distances to the top
+# and bottom of the gap ahead, taken after the bird's move, the same point
+# in the tick train.simulate activates the network. The rewards add up to
+# the fitness train.simulate would give: 0.1 per tick, +5 per pipe passed,
+# -1 for crashing into a pipe. So a NEAT genome flown through FlappyEnv on
+# seed s earns exactly its fitness on episode s.
+
+
+class PipeSchedule:
+    # pipes scroll and spawn on a timetable that doesn't depend on the
+    # episode: a new pipe comes in at PIPE_START_X when the bird passes one,
+    # and that only takes time. Only the heights differ between episodes.
+    # So the pipes of every tick are worked out once, by playing them the
+    # way train.simulate does, until the pattern repeats.
+    #
+    # Pipes are numbered in the order they spawn. For tick t (1 based) the
+    # tables give:
+    #   first    number of the first pipe on screen
+    #   target   number of the pipe the bird looks at, and target_x its x
+    #   near     number of the pipe the bird could hit, -1 for none, near_x its x
+    #   passed   whether a pipe is passed (the score goes up)
+
+    def __init__(self):
+        pipes = [[0, PIPE_START_X, False]] # number, x, passed
+        spawned = 1
+        seen = {}
+        rows = []
+        while True:
+            state = tuple((x, passed) for _, x, passed in pipes)
+            if state in seen:
+                break
+            seen[state] = len(rows)
+
+            ind = 1 if len(pipes) > 1 and BIRD_START_X > pipes[0][1] + PIPE_WIDTH else 0
+            near = [p for p in pipes
+                    if not (p[1] >= BIRD_START_X + BIRD_WIDTH or p[1] + PIPE_WIDTH <= BIRD_START_X)]
+            assert len(near) <= 1, "pipes closer together than a bird"
+            near = near[0] if near else [-1, 0]
+            row = [pipes[0][0], pipes[ind][0], pipes[ind][1], near[0], near[1], False]
+
+            for p in pipes:
+                if not p[2] and p[1] < BIRD_START_X:
+                    p[2] = True
+                    row[5] = True
+            gone = [p for p in pipes if p[1] + PIPE_WIDTH < 0]
+            for p in pipes:
+                p[1] -= Pipe.VEL
+            if row[5]:
+                pipes.append([spawned, PIPE_START_X, False])
+                spawned += 1
+            for p in gone:
+                pipes.remove(p)
+            rows.append(row)
+
+        rows = np.array(rows, dtype=np.int64)
+        self.first, self.target, self.target_x, self.near, self.near_x = rows[:, :5].T
+        self.passed = rows[:, 5].astype(bool)
+        # from tick `start` on the rows repeat every `period` ticks, with
+        # pipe numbers `shift` higher each time around
+        self.start = seen[state]
+        self.period = len(rows) - self.start
+        self.shift = pipes[0][0] - self.first[self.start]
+
+    def lookup(self, t):
+        # table rows and pipe number offsets for an array of ticks t
+        laps = np.maximum(t - 1 - self.start, 0) // self.period
+        return t - 1 - laps * self.period, laps * self.shift
+
+
+_schedule = None
+
+def pipe_schedule():
+    global _schedule
+    if _schedule is None:
+        _schedule = PipeSchedule()
+    return _schedule
+
+
+class FlappyEnv(BirdArrays):
+    # n environments stepped together. extended observations add the
+    # horizontal distance to the gap ahead and the bird's last vertical
+    # move to the three network inputs. Episodes are cut off (truncated)
+    # after max_steps steps if given.
+
+    # pipe heights of each environment are kept for the pipes numbered
+    # first .. first + RING - 1, slot number % RING
+    RING = 4
+
+    def __init__(self, n, seed=None, profile=TRAIN, extended=False, max_steps=None):
+        BirdArrays.__init__(self, n, assets.bird_masks(), profile)
+        self.n = n
+        self.extended = extended
+        self.max_steps = max_steps
+        self.top_mask = assets.pipe_top_mask()
+        self.bottom_mask = assets.pipe_bottom_mask()
+        self.schedule = pipe_schedule()
+        self.all = np.arange(n)
+
+        self.steps = np.zeros(n, dtype=np.int64) # ticks played in the current episode
+        self.score = np.zeros(n, dtype=np.int64)
+        self.seed = np.zeros(n, dtype=np.int64) # seed of each current episode
+        self.pending = np.zeros(n) # reward of the move made for the next step
+        self.last_move = np.zeros(n)
+        self.ring = np.zeros((n, self.RING), dtype=np.int64)
+        self.streams = [None] * n # iterator over each episode's PipeStream
+        self.next_seed = None # seed of every environment's next episode, None for fresh ones
+        self.obs = None
+
+    def reset(self, seed=None):
+        # start all environments over and return their observations. With
+        # a seed, environment i plays the episodes seed + i, seed + i + n, ...
+        self.next_seed = None if seed is None else (seed + self.all) % SEED_RANGE
+        self._start(self.all)
+        return self._begin_tick()
+
+    def step(self, actions):
+        # one tick; actions says for each environment whether its bird
+        # jumps. Returns observations, rewards, done flags and an info dict
+        # of arrays about the episodes that just ended: their score, steps,
+        # seed and whether they were truncated rather than crashed. Ended
+        # environments are already reset, their observation is the new
+        # episode's first.
+        if self.obs is None:
+            raise RuntimeError("call reset() before step()")
+        self.jump(self.all[np.asarray(actions, dtype=bool)])
+        reward = self.pending.copy()
+        schedule = self.schedule
+        row, shift = schedule.lookup(self.steps + 1)
+
+        crashed = self._collide(schedule.near[row] + shift, schedule.near_x[row])
+        reward[crashed] -= 1
+        passed = schedule.passed[row]
+        self.score += passed
+        reward[passed & ~crashed] += 5
+
+        y = self.y
+        out = (y + self.bird_h >= FLOOR) | (y < 0)
+        self.steps += 1
+        truncated = np.zeros(self.n, dtype=bool)
+        if self.max_steps is not None:
+            truncated = ~crashed & ~out & (self.steps >= self.max_steps)
+        done = crashed | out | truncated
+
+        info = {'score': self.score.copy(), 'steps': self.steps.copy(),
+                'seed': self.seed.copy(), 'truncated': truncated}
+        ended = np.flatnonzero(done)
+        self.animate(np.flatnonzero(~done))
+        self._advance_pipes(np.flatnonzero(~done))
+        if len(ended):
+            self._start(ended)
+        return self._begin_tick(), reward, done, info
+
+    def _start(self, idx):
+        # new episodes for the environments idx
+        idx = idx.tolist()
+        for i in idx:
+            if self.next_seed is None:
+                seed = new_seed()
+            else:
+                seed = int(self.next_seed[i])
+                self.next_seed[i] = (seed + self.n) % SEED_RANGE
+            self.seed[i] = seed
+            stream = self.streams[i] = iter(PipeStream(seed))
+            self.ring[i] = [next(stream) for _ in range(self.RING)]
+        self.reset_birds(idx)
+        self.steps[idx] = 0
+        self.score[idx] = 0
+
+    def _advance_pipes(self, idx):
+        # the pipe that leaves the screen makes room for the heights of a
+        # new one, RING pipes further on
+        schedule = self.schedule
+        steps = self.steps[idx]
+        old_row, old_shift = schedule.lookup(steps)
+        new_row, new_shift = schedule.lookup(steps + 1)
+        old = schedule.first[old_row] + old_shift
+        moved = schedule.first[new_row] + new_shift > old
+        for i, number in zip(idx[moved].tolist(), old[moved].tolist()):
+            self.ring[i, number % self.RING] = next(self.streams[i])
+
+    def _heights(self, number):
+        return self.ring[self.all, number % self.RING]
+
+    def _begin_tick(self):
+        # move every bird for its next tick and observe it
+        before = self.y.copy()
+        self.move(self.all)
+        self.last_move = self.y - before
+        self.pending[:] = 0.1
+
+        schedule = self.schedule
+        row, shift = schedule.lookup(self.steps + 1)
+        height = self._heights(schedule.target[row] + shift)
+        y = self.y
+        columns = [y, np.abs(y - (height - PIPE_HEIGHT)), np.abs(y - (height + Pipe.GAP))]
+        if self.extended:
+            columns += [schedule.target_x[row] - BIRD_START_X, self.last_move]
+        self.obs = np.column_stack(columns)
+        return self.obs
+
+    def _collide(self, number, x):
+        # pixel perfect test against the pipe each bird could hit, like
+        # physics.Pipe.collide; number is -1 where there is none
+        hit = np.zeros(self.n, dtype=bool)
+        near = number >= 0
+        if not near.any():
+            return hit
+        height = self._heights(number)
+        top = height - PIPE_HEIGHT
+        bottom = height + Pipe.GAP
+        ry = np.round(self.y).astype(np.int64)
+        near_top = near & (ry < height) & (ry + self.bird_h > top)
+        near_bottom = near & (ry < bottom + PIPE_HEIGHT) & (ry + self.bird_h > bottom)
+
+        for i in np.flatnonzero(near_top | near_bottom).tolist():
+            mask = self.bird_masks[self.frame[i]]
+            dx = int(x[i]) - BIRD_START_X
+            if ((near_bottom[i] and mask.overlap(self.bottom_mask, (dx, int(bottom[i] - ry[i])))) or
+                    (near_top[i] and mask.overlap(self.top_mask, (dx, int(top[i] - ry[i]))))):
+                hit[i] = True
+        return hit
@@ -0,0 +1,85 @@
+import random
+import time
+
+SEED_RANGE = 2**32
+
+
+def new_seed():
+    # a fresh episode seed, drawn from the global random state so seeding
+    # `random` makes a whole training run reproducible
+    return random.randrange(SEED_RANGE)
+
+
+def episode_seeds(k, seed=None):
+    # the seeds of the k episodes a generation is evaluated on: fresh ones,
+    # or seed and the ones after it for a fixed episode set
+    if seed is None:
+        return [new_seed() for _ in range(k)]
+    return [(seed + i) % SEED_RANGE for i in range(k)]
+
+
+AGGREGATES = ('mean', 'min', 'quantile')
+
+def aggregate(values, how='mean', q=0.25):
+    # one fitness from the fitness a genome got on each episode: the mean,
+    # the worst, or the q quantile (interpolated between the two closest)
+    if how == 'mean':
+        return sum(values) / len(values)
+    if how == 'min':
+        return min(values)
+    if how == 'quantile':
+        values = sorted(values)
+        pos = q * (len(values) - 1)
+        lo = int(pos)
+        hi = min(lo + 1, len(values) - 1)
+        return values[lo] + (values[hi] - values[lo]) * (pos - lo)
+    raise ValueError("unknown fitness aggregate {0!r}, expected one of {1}".format(how, AGGREGATES))
+
+
+class PipeStream:
+    # the pipe heights of one episode. They come from a generator seeded with
+    # the episode seed, are produced a chunk at a time as the episode gets
+    # longer and are kept, so every consumer of the same seed (game loop,
+    # trainer, worker process) sees exactly the same pipes.
+
+    CHUNK = 64
+    MIN_HEIGHT = 50
+    MAX_HEIGHT = 450
+
+    def __init__(self, seed):
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self.heights = []
+
+    def __getitem__(self, i):
+        while i >= len(self.heights):
+            self.heights.extend(self._rng.randrange(self.MIN_HEIGHT, self.MAX_HEIGHT)
+                                for _ in range(self.CHUNK))
+        return self.heights[i]
+
+    def __iter__(self):
+        # a cursor over the heights, each pipe spawned takes the next one
+        i = 0
+        while True:
+            yield self[i]
+            i += 1
+
+
+class EpisodeLimits:
+    # when to call an episode over while birds are still alive, so a genome
+    # that has learned to play forever can't stall a generation. None means
+    # no limit; fitness is simply whatever the birds earned until then.
+
+    def __init__(self, max_ticks=None, max_score=None, max_seconds=None):
+        self.max_ticks = max_ticks
+        self.max_score = max_score
+        self.max_seconds = max_seconds
+        self.started = time.perf_counter()
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def reached(self, ticks, score):
+        return ((self.max_ticks is not None and ticks >= self.max_ticks) or
+                (self.max_score is not None and score >= self.max_score) or
+                (self.max_seconds is not None and time.perf_counter() - self.started >= self.max_seconds))
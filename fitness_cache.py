@@ -0,0 +1,81 @@
+import hashlib
+import sys
+from collections import OrderedDict
+
+import neat
+
+
+def genome_key(genome):
+    # hash of everything that shapes the genome's network: its nodes and its
+    # enabled connections, in key order so equal genomes hash the same
+    h = hashlib.blake2b(digest_size=16)
+    for k in sorted(genome.nodes):
+        ng = genome.nodes[k]
+        h.update(repr(('n', k, ng.bias, ng.response, ng.activation, ng.aggregation)).encode())
+    for k in sorted(genome.connections):
+        cg = genome.connections[k]
+        if cg.enabled:
+            h.update(repr(('c', k, cg.weight)).encode())
+    return h.digest()
+
+
+class FitnessCache(neat.reporting.BaseReporter):
+    # remembers the fitness each genome got on each episode seed, so
+    # unchanged genomes (elites, clones) aren't simulated again on the same
+    # pipes. Least recently used entries go first once the cache holds
+    # max_bytes worth of them. Added as a reporter it prints the hit rate
+    # after every generation.
+
+    def __init__(self, max_bytes=16 * 1024 * 1024):
+        self.entries = OrderedDict()
+        sample = (genome_key(neat.DefaultGenome(0)), 0)
+        # key tuple, digest, seed, fitness and the OrderedDict's per entry bookkeeping
+        self.entry_bytes = (sys.getsizeof(sample) + sys.getsizeof(sample[0]) +
+                            sys.getsizeof(2**31) + sys.getsizeof(0.0) + 100)
+        self.max_entries = max(1, max_bytes // self.entry_bytes)
+
+        self.hits = self.misses = 0
+        self.total_hits = self.total_misses = 0
+
+    def get(self, genome, seed):
+        key = (genome_key(genome), seed)
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return fitness
+
+    def put(self, genome, seed, fitness):
+        key = (genome_key(genome), seed)
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def evaluate(self, genomes, seed, simulate):
+        # fill in the fitness of cached genomes and call simulate(genomes)
+        # with the rest, then remember what it found
+        misses = []
+        for gid, g in genomes:
+            fitness = self.get(g, seed)
+            if fitness is None:
+                misses.append((gid, g))
+            else:
+                g.fitness = fitness
+
+        if misses:
+            simulate(misses)
+            for _, g in misses:
+                self.put(g, seed, g.fitness)
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.total_hits += self.hits
+        self.total_misses += self.misses
+        total = self.hits + self.misses
+        if total:
+            print("Fitness cache: {0} hits, {1} misses ({2:.1%} hit rate), {3} entries, ~{4} KB".format(
+                self.hits, self.misses, self.hits / total, len(self.entries),
+                len(self.entries) * self.entry_bytes // 1024))
+        self.hits = self.misses = 0
@@ -0,0 +1,201 @@
+import neat
+import champion
+import train
+import multiprocessing
+from multiprocessing.connection import wait
+import itertools
+import os
+import random
+import time
+import argparse
+
+# island model: several populations, each in its own process and each
+# built from config-feedforward.txt, evolve on their own. Every M
+# generations an island sends copies of its best genomes to the parent over
+# its pipe and takes in whatever migrants are waiting for it. The parent
+# only forwards them around a ring of islands, so nobody ever waits for
+# another island: the only barrier is each island's own generation.
+
+
+class MigrationReporter(neat.reporting.BaseReporter):
+    # runs inside an island. After every `every` generations the island's
+    # `migrants` best genomes are sent out and the migrants that arrived
+    # since the last time take the place of some of the new offspring.
+
+    def __init__(self, conn, island, every, migrants):
+        self.conn = conn
+        self.island = island
+        self.every = every
+        self.migrants = migrants
+        self.generation = None
+        self.best = []
+        self.parents = set()
+        self.immigrants = 0 # immigrants get negative keys, neat never hands those out
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        self.parents = set(population)
+        ranked = sorted(population.values(), key=lambda g: g.fitness, reverse=True)
+        self.best = ranked[:self.migrants]
+        self.conn.send(('progress', self.island, self.generation, best_genome.fitness))
+
+    def end_generation(self, config, population, species_set):
+        if (self.generation + 1) % self.every:
+            return
+        self.conn.send(('migrants', self.island, self.best))
+
+        arrived = []
+        while self.conn.poll():
+            arrived.extend(self.conn.recv())
+        if not arrived:
+            return
+
+        # replace the newest offspring, elites carried over keep their place
+        offspring = sorted((k for k in population if k not in self.parents), reverse=True)
+        for key, genome in zip(offspring, arrived):
+            del population[key]
+            self.immigrants += 1
+            genome.key = -self.immigrants
+            genome.fitness = None
+            self.rekey(config.genome_config, genome, population)
+            population[genome.key] = genome
+        species_set.speciate(config, population, self.generation)
+
+    def rekey(self, genome_config, genome, population):
+        # a migrant's hidden node ids come from another island's node
+        # indexer, so this island's own would hand them out again later.
+        # Give the hidden nodes new ids from this island's indexer.
+        if genome_config.node_indexer is None:
+            genome_config.node_indexer = itertools.count(
+                max(k for g in population.values() for k in g.nodes) + 1)
+        keys = {}
+        nodes = {}
+        for k, node in genome.nodes.items():
+            if k not in genome_config.output_keys:
+                keys[k] = genome_config.get_new_node_key(nodes)
+            node.key = keys.get(k, k)
+            nodes[node.key] = node
+        connections = {}
+        for (a, b), conn in genome.connections.items():
+            conn.key = (keys.get(a, a), keys.get(b, b))
+            connections[conn.key] = conn
+        genome.nodes = nodes
+        genome.connections = connections
+
+
+def island_main(conn, island, seed, config_path, every, migrants, options):
+    # one island: a whole headless train.run with the migration reporter
+    random.seed(seed)
+    migration = MigrationReporter(conn, island, every, migrants)
+    try:
+        winner = train.run(config_path, headless=True, champion_path='', quiet=True,
+                           reporters=[migration], **options)
+        conn.send(('done', island, winner))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+def run_islands(config_path, islands=4, migrate_every=5, migrants=2, seed=None,
+                champion_path=champion.DEFAULT_PATH, **options):
+    # options are passed on to train.run in every island (generations,
+    # vectorized, episodes, max_ticks, ...). Returns the best genome of all
+    # islands and exports it to champion_path.
+    if seed is None:
+        seed = random.randrange(2**32)
+    print("Running {0} islands, migrating {1} genomes every {2} generations (seed {3})".format(
+        islands, migrants, migrate_every, seed))
+
+    conns = []
+    procs = []
+    for i in range(islands):
+        parent_conn, child_conn = multiprocessing.Pipe()
+        proc = multiprocessing.Process(target=island_main, args=(
+            child_conn, i, seed + i, config_path, migrate_every, migrants, options))
+        proc.start()
+        child_conn.close()
+        conns.append(parent_conn)
+        procs.append(proc)
+
+    winners = {}
+    active = list(range(islands))
+    start = time.time()
+    try:
+        while active:
+            for conn in wait([conns[i] for i in active]):
+                i = conns.index(conn)
+                try:
+                    message = conn.recv()
+                except EOFError:
+                    # the island died without a winner
+                    active.remove(i)
+                    procs[i].join()
+                    print("Island {0} exited without finishing (exit code {1})".format(
+                        i, procs[i].exitcode))
+                    continue
+
+                if message[0] == 'progress':
+                    _, _, generation, fitness = message
+                    print("[{0:7.1f}s] island {1} generation {2}: best fitness {3:.1f}".format(
+                        time.time() - start, i, generation, fitness))
+                elif message[0] == 'migrants':
+                    # on to the next island in the ring that is still running
+                    others = [j for j in active if j != i]
+                    if others:
+                        target = min(others, key=lambda j: (j - i) % islands)
+                        try:
+                            conns[target].send(message[2])
+                        except (BrokenPipeError, OSError):
+                            pass # finished in the meantime, its 'done' is on the way
+                elif message[0] == 'done':
+                    if message[2] is not None:
+                        winners[i] = message[2]
+                    active.remove(i)
+    finally:
+        for proc in procs:
+            proc.join()
+
+    if not winners:
+        return None
+    best = max(winners.values(), key=lambda g: g.fitness)
+    print("Best genome: fitness {0:.1f} from island {1}".format(
+        best.fitness, [i for i, g in winners.items() if g is best][0]))
+    if champion_path:
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                    neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+        champion.export(best, config, champion_path)
+        print("Champion saved to {0}".format(champion_path))
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--islands', type=int, default=0,
+                        help='number of island processes, 0 for one per core')
+    parser.add_argument('--migrate-every', type=int, default=5, metavar='M',
+                        help='send migrants every M generations')
+    parser.add_argument('--migrants', type=int, default=2,
+                        help='number of best genomes each island sends out')
+    parser.add_argument('--generations', type=int, default=50,
+                        help='generations each island runs for')
+    parser.add_argument('--seed', type=int, default=None,
+                        help='island i seeds its random state with seed + i')
+    parser.add_argument('--vectorized', action='store_true',
+                        help='simulate each population with numpy arrays')
+    parser.add_argument('--episodes', type=int, default=1, metavar='K',
+                        help='fly every genome through K episodes per generation')
+    parser.add_argument('--max-ticks', type=int, default=None,
+                        help='end an episode after this many simulation ticks')
+    parser.add_argument('--champion', default=champion.DEFAULT_PATH, metavar='PATH',
+                        help="where to save the best genome's network, '' to not save it")
+    args = parser.parse_args()
+
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+    config_path = os.path.join(local_dir, 'config-feedforward.txt')
+    run_islands(config_path, islands=args.islands or multiprocessing.cpu_count(),
+                migrate_every=args.migrate_every, migrants=args.migrants, seed=args.seed,
+                champion_path=args.champion, generations=args.generations,
+                vectorized=args.vectorized, episodes=args.episodes, max_ticks=args.max_ticks)
@@ -0,0 +1,230 @@
+from collections import namedtuple
+import random
+
+import assets
+
+# the game's physics, shared by flappy_bird.py, train.py and batch_sim.py.
+# Nothing in here holds a pygame.Surface: state is plain numbers in
+# __slots__ objects and collisions use the masks from assets. Drawing is
+# in render.py.
+
+# sizes of the 2x sprites in imgs/, the collision masks are built from them
+BIRD_WIDTH = 68
+BIRD_HEIGHT = 48
+PIPE_WIDTH = 104
+PIPE_HEIGHT = 640
+
+BIRD_START_X = 230
+BIRD_START_Y = 350
+PIPE_START_X = 600
+FLOOR = 730 # top of the base, birds die when they reach it
+
+MAX_ROTATION = 25
+ROT_VEL = 20
+ANIMATION_TIME = 5
+
+
+# how a bird falls and jumps. The game was tuned separately for humans and
+# for the networks, so there are two named profiles.
+Profile = namedtuple('Profile', 'name jump_vel gravity jump_boost terminal_dist')
+
+PLAY = Profile('play', jump_vel=-7.5, gravity=1.05, jump_boost=1.5, terminal_dist=16)
+TRAIN = Profile('train', jump_vel=-9.5, gravity=1.5, jump_boost=2, terminal_dist=16)
+
+PROFILES = {p.name: p for p in (PLAY, TRAIN)}
+
+
+class Bird:
+    __slots__ = ('x', 'y', 'tilt', 'tick_count', 'vel', 'height', 'img_count', 'frame', 'profile')
+
+    def __init__(self, x, y, profile=TRAIN):
+        self.x = x
+        self.y = y
+        self.tilt = 0
+        self.tick_count = 0
+        self.vel = 0
+        self.height = y
+        self.img_count = 0
+        self.frame = 0 # wing frame, an index into assets.bird_imgs()
+        self.profile = profile
+
+    def jump(self):
+        self.vel = self.profile.jump_vel
+        self.tick_count = 0
+        self.height = self.y
+
+    def move(self):
+        profile = self.profile
+        self.tick_count += 1
+        d = self.vel*self.tick_count + profile.gravity*self.tick_count**2
+
+        if d >= profile.terminal_dist: # terminal dist
+            d = profile.terminal_dist
+        if d < 0:
+            d -= profile.jump_boost
+
+        self.y += d
+
+        if d < 0 or self.y < self.height + 50:  # tilt up
+            if self.tilt < MAX_ROTATION: # don't overshoot MAX_ROTATION
+                self.tilt = MAX_ROTATION
+        else: # tilt down
+            if self.tilt > -90:
+                self.tilt -= ROT_VEL # as we go more down tilt more
+
+    def animate(self):
+        # advance the wings one frame. Part of the physics since the
+        # collision mask depends on the frame.
+        self.img_count += 1
+
+        # wings flapping animation
+        if self.img_count < ANIMATION_TIME:
+            self.frame = 0
+        elif self.img_count < ANIMATION_TIME * 2:
+            self.frame = 1
+        elif self.img_count < ANIMATION_TIME * 3:
+            self.frame = 2
+        elif self.img_count < ANIMATION_TIME * 4:
+            self.frame = 1
+        elif self.img_count < ANIMATION_TIME * 4 + 1:
+            self.frame = 0
+            self.img_count = 0
+
+        if self.tilt <= -80: # when the bird is falling, render only one image
+            self.frame = 1
+            self.img_count = ANIMATION_TIME * 2
+
+    def out_of_bounds(self):
+        # hit the ground or flew over the screen
+        return self.y + BIRD_HEIGHT >= FLOOR or self.y < 0
+
+    def get_mask(self):
+        return assets.bird_masks()[self.frame]
+
+
+class Pipe:
+    __slots__ = ('x', 'height', 'top', 'bottom', 'passed', 'heights')
+
+    GAP = 200
+    VEL = 5
+
+    # pixel tests run and skipped by the broad phase in collide, per pipe half
+    narrow_checks = 0
+    skipped_checks = 0
+
+    def __init__(self, x, heights=None):
+        self.heights = heights # the episode's PipeStream cursor, None for unseeded pipes
+        self.reset(x)
+
+    def reset(self, x):
+        # (re)spawn the pipe at x with the next height, PipeRing reuses pipes
+        self.x = x
+        self.height = 0
+
+        # where the top and bottom of the pipe is
+        self.top = 0
+        self.bottom = 0
+
+        self.passed = False
+        self.set_height()
+
+    def set_height(self):
+        # set the height of the pipe, from the top of the screen
+        if self.heights is not None:
+            self.height = next(self.heights)
+        else:
+            self.height = random.randrange(50, 450)
+        self.top = self.height - PIPE_HEIGHT
+        self.bottom = self.height + self.GAP
+
+    def move(self):
+        self.x -= self.VEL
+
+    def off_screen(self):
+        return self.x + PIPE_WIDTH < 0
+
+    def collide(self, bird):
+        bird_mask = bird.get_mask()
+        top_mask = assets.pipe_top_mask()
+        bottom_mask = assets.pipe_bottom_mask()
+        bird_y = round(bird.y)
+
+        # broad phase: only run the pixel test for pipe halves whose bounding
+        # box overlaps the bird's, nothing outside of it can collide
+        if self.x >= bird.x + BIRD_WIDTH or self.x + PIPE_WIDTH <= bird.x:
+            Pipe.skipped_checks += 2
+            return False
+        check_top = bird_y < self.height and bird_y + BIRD_HEIGHT > self.top
+        check_bottom = bird_y < self.bottom + PIPE_HEIGHT and bird_y + BIRD_HEIGHT > self.bottom
+        Pipe.narrow_checks += check_top + check_bottom
+        Pipe.skipped_checks += 2 - check_top - check_bottom
+
+        # how far away the bird_mask and top_mask and bird_mask and bottom_mask are
+        top_offset = (self.x - bird.x, self.top - bird_y)
+        bottom_offset = (self.x - bird.x, self.bottom - bird_y)
+
+        b_point = check_bottom and bird_mask.overlap(bottom_mask, bottom_offset)
+        t_point = check_top and bird_mask.overlap(top_mask, top_offset)
+
+        if b_point or t_point:
+            return True
+        return False
+
+
+class PipeRing:
+    # the pipes on screen, oldest first, kept in a fixed ring of Pipe slots.
+    # A pipe that leaves the screen gives its slot (and its Pipe object) to
+    # the next one spawned, so an episode allocates a handful of pipes no
+    # matter how long it runs. Indexing, len and iteration work like the
+    # list of pipes the game loops used to keep, all in O(1) per pipe.
+
+    CAPACITY = 4 # never more than 3 pipes are on screen at once
+
+    def __init__(self, heights=None):
+        self.heights = heights # PipeStream cursor the pipes take their heights from
+        self.slots = [None] * self.CAPACITY
+        self.head = 0 # slot of the oldest pipe
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.count
+        if not 0 <= i < self.count:
+            raise IndexError("pipe index out of range")
+        return self.slots[(self.head + i) % len(self.slots)]
+
+    def __iter__(self):
+        slots = self.slots
+        capacity = len(slots)
+        for i in range(self.head, self.head + self.count):
+            yield slots[i % capacity]
+
+    def spawn(self, x):
+        # a new pipe at x behind the others
+        if self.count == len(self.slots):
+            # only if the pipe spacing changes, keeps the order
+            self.slots = list(self) + [None] * len(self.slots)
+            self.head = 0
+        i = (self.head + self.count) % len(self.slots)
+        pipe = self.slots[i]
+        if pipe is None:
+            pipe = self.slots[i] = Pipe(x, self.heights)
+        else:
+            pipe.reset(x)
+        self.count += 1
+        return pipe
+
+    def release(self, k=1):
+        # the k oldest pipes are gone, their slots are free again
+        self.head = (self.head + k) % len(self.slots)
+        self.count -= k
+
+
+def pipe_index(birds, pipes):
+    # the pipe the birds are looking at: the first one they haven't cleared
+    if birds and len(pipes) > 1 and birds[0].x > pipes[0].x + PIPE_WIDTH:
+        return 1
+    return 0
@@ -0,0 +1,120 @@
+import csv
+import json
+import os
+import time
+
+import neat
+
+
+class PhaseProfiler(neat.reporting.BaseReporter):
+    # where a generation's simulation time went, phase by phase. The
+    # simulation loops call mark() at the start of a tick and lap(phase)
+    # after each phase, so a tick costs a few perf_counter calls and nothing
+    # per bird. Added as a reporter it prints a summary after every
+    # generation and, given a path, appends one row per generation to it:
+    # a line of JSON if the path ends in .jsonl, an element of a JSON array
+    # if it ends in .json, CSV otherwise. A resumed run carries on in the
+    # same file, like StatsLog.
+    #
+    # draw includes handling window events and waiting for the frame cap.
+
+    PHASES = ('move', 'activate', 'collide', 'pipes', 'bounds', 'animate', 'draw')
+
+    def __init__(self, path=None):
+        self.path = path
+        self.generation = None
+        self.last = 0.0
+        self.reset()
+
+    def reset(self):
+        self.seconds = dict.fromkeys(self.PHASES, 0.0)
+        self.ticks = 0
+        self.bird_ticks = 0 # living birds summed over the ticks, one activation each
+        self.collisions = 0 # bird/pipe pairs passed to collide
+
+    def mark(self):
+        self.last = time.perf_counter()
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.seconds[phase] += now - self.last
+        self.last = now
+
+    def tick(self, alive):
+        self.ticks += 1
+        self.bird_ticks += alive
+
+    def totals(self):
+        # everything recorded so far, picklable so workers can send it back
+        return {'seconds': dict(self.seconds), 'ticks': self.ticks,
+                'bird_ticks': self.bird_ticks, 'collisions': self.collisions}
+
+    def merge(self, totals):
+        for phase, seconds in totals['seconds'].items():
+            self.seconds[phase] += seconds
+        self.ticks += totals['ticks']
+        self.bird_ticks += totals['bird_ticks']
+        self.collisions += totals['collisions']
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.reset()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        total = sum(self.seconds.values())
+        row = {
+            'generation': self.generation,
+            'ticks': self.ticks,
+            'ticks_per_sec': self.ticks / total if total else 0.0,
+            'birds_alive': self.bird_ticks / self.ticks if self.ticks else 0.0,
+            'activations': self.bird_ticks,
+            'collisions_tested': self.collisions,
+            'seconds': total,
+        }
+        for phase in self.PHASES:
+            row[phase + '_seconds'] = self.seconds[phase]
+
+        if total:
+            print("Phases: " + ", ".join("{0} {1:.1%}".format(phase, self.seconds[phase] / total)
+                                         for phase in self.PHASES if self.seconds[phase]))
+            print("Profile: {0:.0f} ticks/s, {1:.1f} birds alive on average, {2} collisions tested".format(
+                row['ticks_per_sec'], row['birds_alive'], self.collisions))
+
+        if self.path:
+            self.write(row)
+
+    def write(self, row):
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+        if self.path.endswith('.jsonl'):
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(row) + '\n')
+            return
+        if self.path.endswith('.json'):
+            self.append_json(row, new)
+            return
+
+        # the header only goes at the top of a new file
+        with open(self.path, 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(row))
+            if new:
+                writer.writeheader()
+            writer.writerow(row)
+
+    def append_json(self, row, new):
+        # the file stays one JSON array: the row goes in place of the
+        # closing bracket, so nothing before it is written again
+        if new:
+            with open(self.path, 'w') as f:
+                f.write('[\n' + json.dumps(row) + '\n]\n')
+            return
+        with open(self.path, 'r+b') as f:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            f.seek(max(end - 64, 0))
+            tail = f.read()
+            close = tail.rfind(b']')
+            if close < 0:
+                raise ValueError("{0} doesn't end in a JSON array".format(self.path))
+            f.seek(end - len(tail) + close)
+            f.truncate()
+            f.write((',\n' + json.dumps(row) + '\n]\n').encode())
@@ -0,0 +1,184 @@
+import pygame
+
+import assets
+from physics import BIRD_WIDTH, BIRD_HEIGHT, PIPE_WIDTH
+
+# everything that draws: the physics in physics.py never needs this module,
+# so headless training doesn't either
+
+WIN_WIDTH = 500
+WIN_HEIGHT = 800
+
+
+def stat_font():
+    return assets.font('freesansbold.ttf', 20)
+
+def stat_font_large():
+    return assets.font('freesansbold.ttf', 35)
+
+def train_font():
+    return assets.sys_font("comicsans", 50)
+
+
+class Base:
+    # the scrolling ground, pure scenery
+    VEL = 5
+
+    def __init__(self, y):
+        self.y = y
+        self.x1 = 0
+        self.x2 = self.WIDTH
+
+    def move(self):
+        self.x1 -= self.VEL
+        self.x2 -= self.VEL
+
+        if self.x1 + self.WIDTH < 0:
+            self.x1 = self.WIDTH + self.x2
+
+        if self.x2 + self.WIDTH < 0:
+            self.x2 = self.WIDTH + self.x1
+
+    @property
+    def IMG(self):
+        return assets.base_img()
+
+    @property
+    def WIDTH(self):
+        return self.IMG.get_width()
+
+    def draw(self, win):
+        win.blit(self.IMG, (self.x1, self.y))
+        win.blit(self.IMG, (self.x2, self.y))
+
+
+class DirtyRenderer:
+    # draws a frame onto win but only pushes the parts that changed to the
+    # display. Every rect drawn is remembered; the next frame first paints
+    # the background back over those rects instead of blitting the whole
+    # 500x800 background, then updates just the old and new rects.
+
+    def __init__(self, win):
+        self.win = win
+        self.drawn = []
+        self.restored = []
+        self.full_update = True
+        self.texts = {}
+
+    def begin(self):
+        bg = assets.bg_img()
+        if self.full_update:
+            self.win.blit(bg, (0, 0))
+        else:
+            for rect in self.drawn:
+                self.win.blit(bg, rect, rect)
+        self.restored = self.drawn
+        self.drawn = []
+
+    def blit(self, surface, pos):
+        self.drawn.append(self.win.blit(surface, pos))
+
+    def line(self, color, start, end, width):
+        self.drawn.append(pygame.draw.line(self.win, color, start, end, width))
+
+    def text(self, font, text, color):
+        # rendered labels are kept, the score or alive count rarely changes
+        key = (id(font), text, color)
+        surface = self.texts.get(key)
+        if surface is None:
+            if len(self.texts) > 256:
+                self.texts.clear()
+            surface = self.texts[key] = font.render(text, 1, color)
+        return surface
+
+    def end(self):
+        if self.full_update:
+            pygame.display.update()
+            self.full_update = False
+        else:
+            pygame.display.update(self.restored + self.drawn)
+
+
+def draw_bird(win, bird):
+    # pre-rotated sprite, turned around its center by the tilt angle
+    img = assets.rotated_bird(bird.frame, bird.tilt)
+    center = (bird.x + BIRD_WIDTH // 2, bird.y + BIRD_HEIGHT // 2)
+    win.blit(img, img.get_rect(center=center).topleft)
+
+
+def draw_pipe(win, pipe):
+    win.blit(assets.pipe_top_img(), (pipe.x, pipe.top))
+    win.blit(assets.pipe_img(), (pipe.x, pipe.bottom))
+
+
+def draw_window(screen, birds, pipes, base, score, gen, pipe_ind, draw_lines=True, alive=None):
+    # the training view: the birds, and with draw_lines what each one's
+    # network is looking at. screen is a DirtyRenderer. alive is the number
+    # of birds still flying when only some of them are drawn.
+    screen.begin()
+
+    for pipe in pipes:
+        draw_pipe(screen, pipe)
+
+    text = screen.text(train_font(), "Score: " + str(score), (255, 255, 255))
+    screen.blit(text, (WIN_WIDTH - 10 - text.get_width(), 10))
+
+    text = screen.text(train_font(), "Gen: " + str(gen), (255, 255, 255))
+    screen.blit(text, (10, 10))
+
+    score_label = screen.text(train_font(), "Alive: " + str(len(birds) if alive is None else alive), (255,255,255))
+    screen.blit(score_label, (10, 50))
+
+    base.draw(screen)
+
+    for bird in birds:
+        if draw_lines and pipe_ind < len(pipes):
+            pipe = pipes[pipe_ind]
+            center = (bird.x + BIRD_WIDTH / 2, bird.y + BIRD_HEIGHT / 2)
+            screen.line((255,0,0), center, (pipe.x + PIPE_WIDTH / 2, pipe.height), 3)
+            screen.line((255,0,0), center, (pipe.x + PIPE_WIDTH / 2, pipe.bottom), 3)
+        draw_bird(screen, bird)
+    screen.end()
+
+
+def draw_game_screen(screen, birds, pipes, base, score):
+    # the game view, screen is a DirtyRenderer
+    screen.begin()
+
+    for pipe in pipes:
+        draw_pipe(screen, pipe)
+
+    text = screen.text(stat_font(), "Score: " + str(score), (255, 255, 255))
+    screen.blit(text, (WIN_WIDTH - 10 - text.get_width(), 10))
+
+    base.draw(screen)
+
+    for bird in birds:
+        draw_bird(screen, bird)
+    screen.end()
+
+
+def draw_pause_screen(win, base, score):
+
+    text = stat_font().render("High Score: " + str(score), 1, (255, 255, 255))
+    win.blit(text, (WIN_WIDTH - 10 - text.get_width(), 10))
+
+
+    s = pygame.Surface((WIN_WIDTH // 2, WIN_HEIGHT // 2))  # the size of your rect
+    s.set_alpha(64)                # alpha level
+    s.fill((255,255,255))           # this fills the entire surface
+    win.blit(s, (WIN_WIDTH // 4, WIN_HEIGHT // 4))
+
+
+    text = stat_font_large().render("Flappy Bird", 2, (235, 69, 14))
+    win.blit(text, (250 - text.get_width() / 2, 300))
+    text = stat_font().render("Press Space to Play", 2, (235, 99, 14))
+    win.blit(text, (250 - text.get_width() / 2, 400))
+    text = stat_font().render("Press 'T' to Train", 2, (235, 99, 14))
+    win.blit(text, (250 - text.get_width() / 2, 450))
+    text = stat_font().render("Press 'A' for Autopilot", 2, (235, 99, 14))
+    win.blit(text, (250 - text.get_width() / 2, 500))
+
+
+    base.draw(win)
+    pygame.display.update()
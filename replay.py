@@ -0,0 +1,305 @@
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from episode import PipeStream
+from physics import PROFILES, TRAIN, BIRD_START_X, BIRD_START_Y, PIPE_START_X, Bird, PipeRing, pipe_index
+
+# episodes recorded as compact binary streams, and re-flown from them.
+#
+# Everything a bird does follows from the pipes, which come from the
+# episode seed, and from the ticks it jumped at. So an episode is stored as
+# its seed, one bit per living bird per tick saying whether it jumped, and
+# the tick each bird died at. A replay rebuilds the physics from that, which
+# is fast enough to seek anywhere without drawing.
+#
+# A file is MAGIC and VERSION, then records of (kind, episode number,
+# payload length) and the payload:
+#   b'B'  begin: seed, generation, number of birds, profile name
+#   b'C'  a piece of the zlib compressed jump bits
+#   b'E'  end: ticks flown, then each bird's death tick (0 = still flying)
+# Records of episodes flown at the same time (BatchSim) may be interleaved.
+# The jump bits of a tick are np.packbits of the birds flying at the start
+# of it, in bird order, so a row shrinks as birds die.
+
+MAGIC = b'FBRP'
+VERSION = 1
+
+_RECORD = struct.Struct('<cII')
+_BEGIN = struct.Struct('<QIIB')
+_TICKS = struct.Struct('<I')
+
+
+class Recorder:
+    # writes the episodes of a training run to path. Every episode holds at
+    # most BUFFER bytes of compressed bits before they go to the file.
+
+    BUFFER = 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(MAGIC + bytes([VERSION]))
+        self.episodes = 0
+        self.open = set()
+
+    def begin(self, seed, birds, generation=0, profile=TRAIN):
+        # start recording an episode of `birds` birds, birds are 0..birds-1
+        episode = EpisodeRecorder(self, self.episodes, birds)
+        self.episodes += 1
+        name = profile.name.encode()
+        self.write(b'B', episode.number, _BEGIN.pack(seed, generation, birds, len(name)) + name)
+        self.open.add(episode)
+        return episode
+
+    def batch(self, seeds, birds, generation=0, profile=TRAIN):
+        # one episode per seed for a multi-episode BatchSim of `birds` birds each
+        return BatchRecorder([self.begin(seed, birds, generation, profile) for seed in seeds], birds)
+
+    def write(self, kind, number, payload):
+        self.file.write(_RECORD.pack(kind, number, len(payload)))
+        self.file.write(payload)
+
+    def close(self):
+        # episodes cut short by an interrupt end where they got to
+        for episode in list(self.open):
+            episode.end()
+        self.file.close()
+
+
+class EpisodeRecorder:
+
+    def __init__(self, recorder, number, birds):
+        self.recorder = recorder
+        self.number = number
+        self.ticks = 0
+        self.jumped = np.zeros(birds, dtype=bool)
+        self.death = np.zeros(birds, dtype=np.uint32)
+        self.flying = np.arange(birds)
+        self.compressor = zlib.compressobj(9)
+        self.pending = []
+        self.pending_bytes = 0
+
+    # jump and die take a bird number or an array of them
+
+    def jump(self, bird):
+        self.jumped[bird] = True
+
+    def die(self, bird):
+        self.death[bird] = self.ticks + 1
+
+    def end_tick(self):
+        # call once at the end of every tick the episode had birds flying
+        self.ticks += 1
+        flying = self.flying
+        self._add(self.compressor.compress(np.packbits(self.jumped[flying]).tobytes()))
+        self.jumped[flying] = False
+        self.flying = flying[self.death[flying] == 0]
+
+    def _add(self, data):
+        if data:
+            self.pending.append(data)
+            self.pending_bytes += len(data)
+        if self.pending_bytes >= self.recorder.BUFFER:
+            self._flush()
+
+    def _flush(self):
+        if self.pending_bytes:
+            self.recorder.write(b'C', self.number, b''.join(self.pending))
+        self.pending = []
+        self.pending_bytes = 0
+
+    def end(self):
+        self._add(self.compressor.flush())
+        self._flush()
+        self.recorder.write(b'E', self.number, _TICKS.pack(self.ticks) + self.death.astype('<u4').tobytes())
+        self.recorder.open.discard(self)
+
+
+class BatchRecorder:
+    # the episodes of a BatchSim, bird k * n + j being bird j of episode k
+
+    def __init__(self, episodes, n):
+        self.episodes = episodes
+        self.n = n
+
+    def jump(self, birds):
+        for k, j in self._split(birds):
+            self.episodes[k].jump(j)
+
+    def die(self, birds):
+        for k, j in self._split(birds):
+            self.episodes[k].die(j)
+
+    def _split(self, birds):
+        k, j = np.divmod(birds, self.n)
+        for episode in np.unique(k).tolist():
+            yield episode, j[k == episode]
+
+    def end_tick(self, flying):
+        # flying: the birds that were alive at the start of the tick
+        for k in np.unique(flying // self.n).tolist():
+            self.episodes[k].end_tick()
+
+    def end(self):
+        for episode in self.episodes:
+            episode.end()
+
+
+class RecordedEpisode:
+    # what a replay file says about one episode, the jump bits stay in the file
+
+    def __init__(self, path, number, seed, generation, birds, profile):
+        self.path = path
+        self.number = number
+        self.seed = seed
+        self.generation = generation
+        self.birds = birds
+        self.profile = profile
+        self.chunks = [] # (offset, length) of the compressed bits
+        self.ticks = None # None if the recording was cut off
+        self.death = None
+
+    def bits(self):
+        decompressor = zlib.decompressobj()
+        data = []
+        with open(self.path, 'rb') as f:
+            for offset, length in self.chunks:
+                f.seek(offset)
+                data.append(decompressor.decompress(f.read(length)))
+        return b''.join(data)
+
+    def __repr__(self):
+        return "<episode {0}: generation {1}, seed {2}, {3} birds, {4} ticks>".format(
+            self.number, self.generation, self.seed, self.birds, self.ticks)
+
+
+def load(path):
+    # the episodes recorded in path, in the order they were started. A file
+    # whose end was cut off (a killed run) reads up to the last whole record.
+    episodes = {}
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if f.read(len(MAGIC) + 1) != MAGIC + bytes([VERSION]):
+            raise ValueError("{0} is not a replay file this version can read".format(path))
+        while True:
+            header = f.read(_RECORD.size)
+            if len(header) < _RECORD.size:
+                break
+            kind, number, length = _RECORD.unpack(header)
+            offset = f.tell()
+            if offset + length > size:
+                break
+            if kind == b'C':
+                episodes[number].chunks.append((offset, length))
+                f.seek(length, 1)
+                continue
+            payload = f.read(length)
+            if kind == b'B':
+                seed, generation, birds, name_len = _BEGIN.unpack_from(payload)
+                profile = PROFILES[payload[_BEGIN.size:_BEGIN.size + name_len].decode()]
+                episodes[number] = RecordedEpisode(path, number, seed, generation, birds, profile)
+            elif kind == b'E':
+                episode = episodes[number]
+                episode.ticks = _TICKS.unpack_from(payload)[0]
+                episode.death = np.frombuffer(payload, dtype='<u4', offset=_TICKS.size).astype(np.int64)
+    return [episodes[k] for k in sorted(episodes)]
+
+
+class ReplaySim:
+    # flies a recorded episode again with the physics objects, tick by tick
+    # exactly like train.simulate, taking the jumps from the recording. The
+    # death ticks, when recorded, are checked on the way.
+
+    def __init__(self, episode):
+        self.episode = episode
+        self.data = episode.bits()
+        self.reset()
+
+    def reset(self):
+        episode = self.episode
+        self.pos = 0
+        self.ticks = 0
+        self.score = 0
+        self.birds = [Bird(BIRD_START_X, BIRD_START_Y, episode.profile) for _ in range(episode.birds)]
+        self.flying = list(range(episode.birds)) # numbers of the living birds, in order
+        self.heights = iter(PipeStream(episode.seed))
+        self.pipes = PipeRing(self.heights)
+        self.pipes.spawn(PIPE_START_X)
+
+    def alive(self):
+        return [self.birds[i] for i in self.flying]
+
+    def pipe_index(self):
+        return pipe_index(self.alive(), self.pipes)
+
+    def done(self):
+        if not self.flying:
+            return True
+        if self.episode.ticks is not None and self.ticks >= self.episode.ticks:
+            return True
+        # a cut off recording ends where its bits do
+        return self.pos + (len(self.flying) + 7) // 8 > len(self.data)
+
+    def tick(self):
+        # one tick, False if the recording is over
+        if self.done():
+            return False
+        flying = self.flying
+        birds = self.birds
+        size = (len(flying) + 7) // 8
+        row = np.unpackbits(np.frombuffer(self.data, dtype=np.uint8, count=size, offset=self.pos))
+        self.pos += size
+        died = []
+
+        for i in flying:
+            birds[i].move()
+        for i in np.flatnonzero(row[:len(flying)]).tolist():
+            birds[flying[i]].jump()
+
+        add_pipe = False
+        gone = 0
+        for pipe in self.pipes:
+            if flying:
+                if not pipe.passed and pipe.x < birds[flying[0]].x:
+                    pipe.passed = True
+                    add_pipe = True
+                hit = [i for i in flying if pipe.collide(birds[i])]
+                if hit:
+                    died.extend(hit)
+                    flying = [i for i in flying if i not in hit]
+
+            if pipe.off_screen():
+                gone += 1
+            pipe.move()
+
+        if add_pipe:
+            self.score += 1
+            self.pipes.spawn(PIPE_START_X)
+        self.pipes.release(gone)
+
+        out = [i for i in flying if birds[i].out_of_bounds()]
+        if out:
+            died.extend(out)
+            flying = [i for i in flying if i not in out]
+
+        for i in flying:
+            birds[i].animate()
+
+        self.flying = flying
+        self.ticks += 1
+        death = self.episode.death
+        if death is not None and sorted(died) != np.flatnonzero(death == self.ticks).tolist():
+            raise ValueError("replay of episode {0} differs from the recording at tick {1}".format(
+                self.episode.number, self.ticks))
+        return True
+
+    def seek(self, tick):
+        # re-fly up to `tick` without drawing anything; going back starts over
+        if tick < self.ticks:
+            self.reset()
+        while self.ticks < tick and self.tick():
+            pass
+        return self.ticks
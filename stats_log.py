@@ -0,0 +1,57 @@
+import json
+import time
+
+import neat
+from neat.math_util import mean, stdev
+
+
+class StatsLog(neat.reporting.BaseReporter):
+    # a per generation summary appended to `path` as one JSON object per
+    # line, instead of neat.StatisticsReporter keeping every generation's best
+    # genome and species fitnesses in memory. Only the best fitness seen so
+    # far is remembered between generations. The file is line buffered and
+    # appended to, so `tail -f` follows a run and a resumed run carries on in
+    # the same file.
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', buffering=1)
+        self.generation = None
+        self.started = None
+        self.best_fitness = None
+        self.best_key = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+        self.started = time.perf_counter()
+
+    def post_evaluate(self, config, population, species, best_genome):
+        fitnesses = [g.fitness for g in population.values()]
+        if self.best_fitness is None or best_genome.fitness > self.best_fitness:
+            self.best_fitness = best_genome.fitness
+            self.best_key = best_genome.key
+
+        species_fitness = {}
+        for sid, s in species.species.items():
+            members = [m.fitness for m in s.members.values() if m.fitness is not None]
+            species_fitness[sid] = [len(s.members), round(mean(members), 3) if members else None]
+
+        row = {
+            'generation': self.generation,
+            'time': round(time.time(), 3),
+            'seconds': round(time.perf_counter() - self.started, 4),
+            'population': len(fitnesses),
+            'fitness_mean': mean(fitnesses),
+            'fitness_stdev': stdev(fitnesses),
+            'fitness_max': max(fitnesses),
+            'fitness_min': min(fitnesses),
+            'best_key': best_genome.key,
+            'best_size': list(best_genome.size()),
+            'best_ever_fitness': self.best_fitness,
+            'best_ever_key': self.best_key,
+            'species': species_fitness, # id: [members, mean fitness]
+        }
+        self.file.write(json.dumps(row, separators=(',', ':')) + '\n')
+
+    def close(self):
+        self.file.close()
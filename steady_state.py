@@ -0,0 +1,98 @@
+import math
+import queue
+
+import neat
+
+# evolution without waiting for the slowest bird. Population.run evaluates
+# a whole generation and only then reproduces, so one genome that flies for
+# minutes leaves every other worker idle. Here every genome is its own pool
+# task and results are taken in whatever order they finish. As soon as
+# `ready` of a generation's genomes are back, the finished genomes are
+# speciated and handed to neat's reproduction like a normal generation, and
+# the offspring go straight to the workers. Stragglers keep flying and join
+# the generation that is open when they land, with the fitness they earned
+# on their own episodes.
+
+
+class SteadyState:
+
+    # evaluator is train.ParallelEvaluator, cache the FitnessCache if any
+
+    def __init__(self, population, evaluator, ready=0.9, cache=None):
+        # 0 would breed from nothing, above 1 waits for more genomes than there are
+        if not 0 < ready <= 1:
+            raise ValueError("ready must be a fraction in (0, 1], got {0!r}".format(ready))
+        self.p = population
+        self.evaluator = evaluator
+        self.ready = ready
+        self.cache = cache
+        self.results = queue.Queue() # (genome key, eval_genome result of each episode, or an exception)
+        self.in_flight = {} # key -> genome being evaluated
+        self.done = {} # key -> evaluated genome, not yet part of a generation
+
+    def submit(self, population):
+        # start a generation's genomes, fitness cache hits are done right away
+        key = self.evaluator.next_episode()
+        for gid, g in population.items():
+            fitness = self.cache.get(g, key) if self.cache is not None else None
+            if fitness is not None:
+                g.fitness = fitness
+                self.done[gid] = g
+                continue
+            self.in_flight[gid] = (g, key)
+            self.evaluator.submit(g, lambda result, gid=gid: self.results.put((gid, result)),
+                                  lambda error, gid=gid: self.results.put((gid, error)))
+
+    def collect(self):
+        # wait for the next result and file its genome as done
+        gid, result = self.results.get()
+        if isinstance(result, BaseException):
+            raise result
+        g, key = self.in_flight.pop(gid)
+        self.evaluator.record(g, result)
+        if self.cache is not None:
+            self.cache.put(g, key, g.fitness)
+        self.done[gid] = g
+
+    def run(self, n):
+        # like Population.run(fitness_function, n), returns the best genome
+        p = self.p
+        config = p.config
+
+        for _ in range(n):
+            p.reporters.start_generation(p.generation)
+            batch = list(p.population)
+            self.submit(p.population)
+
+            need = math.ceil(self.ready * len(batch))
+            while sum(1 for gid in batch if gid in self.done) < need:
+                self.collect()
+            while not self.results.empty():
+                self.collect()
+
+            # the generation is whatever has finished, stragglers included
+            p.population, self.done = self.done, {}
+            p.species.speciate(config, p.population, p.generation)
+            best = max(p.population.values(), key=lambda g: g.fitness)
+            p.reporters.post_evaluate(config, p.population, p.species, best)
+            if p.best_genome is None or best.fitness > p.best_genome.fitness:
+                p.best_genome = best
+
+            if not config.no_fitness_termination:
+                fv = p.fitness_criterion(g.fitness for g in p.population.values())
+                if fv >= config.fitness_threshold:
+                    p.reporters.found_solution(config, p.generation, best)
+                    break
+
+            p.population = p.reproduction.reproduce(config, p.species, config.pop_size, p.generation)
+            if not p.species.species:
+                p.reporters.complete_extinction()
+                if not config.reset_on_extinction:
+                    raise neat.population.CompleteExtinctionException()
+                p.population = p.reproduction.create_new(config.genome_type, config.genome_config,
+                                                         config.pop_size)
+            p.species.speciate(config, p.population, p.generation)
+            p.reporters.end_generation(config, p.population, p.species)
+            p.generation += 1
+
+        return p.best_genome
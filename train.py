@@ -1,203 +1,45 @@
 import pygame
 import neat
+from batch_sim import BatchSim
+from batch_net import BatchNetwork
+from checkpointer import AtomicCheckpointer
+from episode import PipeStream, EpisodeLimits, AGGREGATES, aggregate, episode_seeds
+from fitness_cache import FitnessCache
+from profiler import PhaseProfiler
+from replay import Recorder
+from stats_log import StatsLog
+from steady_state import SteadyState
+from physics import Bird, Pipe, PipeRing, TRAIN, pipe_index
+from render import Base, DirtyRenderer, WIN_WIDTH, WIN_HEIGHT, draw_window
+import assets
+import champion
 import time
 import os
-import random
-pygame.font.init() # init font
+import argparse
+import heapq
+import multiprocessing
+import signal
 
-WIN_WIDTH = 500
-WIN_HEIGHT = 800
 DRAW_LINES = True
+HEADLESS = False # skip the window, frame cap and blitting while training
+VECTORIZED = False # step the whole population with numpy arrays, always headless
+RENDER_EVERY = 1 # spectator mode: only draw every Nth simulation tick
+SPECTATE_TOP = None # spectator mode: only draw the K best birds
 
 GEN = 0
+SEED = None # episode seed of the generation being evaluated
+SEEDS = [] # all its episode seeds when every genome flies several episodes, SEED is the first
+EPISODE_SEED = None # evaluate every generation on this episode instead of a new one
+EPISODES = 1 # episodes per genome per generation
+AGGREGATE = 'mean' # how the fitness of a genome's episodes is combined, see episode.aggregate
+QUANTILE = 0.25 # the quantile for AGGREGATE = 'quantile'
+CACHE = None # FitnessCache shared by the fitness functions, if enabled
+LIMITS = EpisodeLimits() # when to end an episode that is still going
+PROFILER = None # PhaseProfiler timing the simulation loops, off by default
+RECORDER = None # replay.Recorder writing every episode to a replay file, off by default
 
 
 
-BIRD_IMGS = [pygame.transform.scale2x(pygame.image.load(os.path.join('imgs', 'bird1.png'))),
-            pygame.transform.scale2x(pygame.image.load(os.path.join('imgs', 'bird2.png'))),
-            pygame.transform.scale2x(pygame.image.load(os.path.join('imgs', 'bird3.png')))]
-
-PIPE_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join('imgs', 'pipe.png')))
-BASE_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join('imgs', 'base.png')))
-BG_IMG = pygame.transform.scale2x(pygame.image.load(os.path.join('imgs', 'bg.png')))
-
-STAT_FONT = pygame.font.SysFont("comicsans", 50)
-
-class Bird:
-    IMGS = BIRD_IMGS
-    MAX_ROTATION = 25
-    ROT_VEL = 20
-    ANIMATION_TIME = 5
-
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.tilt = 0
-        self.tick_count = 0
-        self.vel = 0
-        self.height = y
-        self.img_count = 0
-        self.img = self.IMGS[0]
-
-    def jump(self):
-        self.vel = -9.5
-        self.tick_count = 0
-        self.height = self.y
-
-    def move(self):
-        self.tick_count += 1
-        d = self.vel*self.tick_count + 1.5*self.tick_count**2
-
-        if d >= 16: # terminal dist
-            # d = d / abs(d) * 16
-            d = 16
-        if d < 0:
-            d -= 2
-
-        self.y += d
-
-        if d < 0 or self.y < self.height + 50:  # tilt up
-            if self.tilt < self.MAX_ROTATION: # don't overshoot MAX_ROTATION
-                self.tilt = self.MAX_ROTATION
-        else: # tilt down
-            if self.tilt > -90:
-                self.tilt -= self.ROT_VEL # as we go more down tilt more
-        
-    def draw(self, win): # window
-        self.img_count += 1
-
-        # wings flapping animation 
-        if self.img_count < self.ANIMATION_TIME:
-            self.img = self.IMGS[0]
-        elif self.img_count < self.ANIMATION_TIME * 2:
-            self.img = self.IMGS[1]
-        elif self.img_count < self.ANIMATION_TIME * 3:
-            self.img = self.IMGS[2]
-        elif self.img_count < self.ANIMATION_TIME * 4:
-            self.img = self.IMGS[1]
-        elif self.img_count < self.ANIMATION_TIME * 4 + 1:
-            self.img = self.IMGS[0]
-            self.img_count = 0
-
-        if self.tilt <= -80: # when the bird is falling, render only one image
-            self.img = self.IMGS[1]
-            self.img_count = self.ANIMATION_TIME * 2
-
-        # rotate image around center based on tilt angle
-        rotated_image = pygame.transform.rotate(self.img, self.tilt)
-        new_rect = rotated_image.get_rect(center=self.img.get_rect(topleft= (self.x, self.y)).center)
-        win.blit(rotated_image, new_rect.topleft)
-
-    def get_mask(self):
-        return pygame.mask.from_surface(self.img)
-
-
-class Pipe:
-    GAP = 200
-    VEL = 5
-
-    def __init__(self, x):
-        self.x = x
-        self.height = 0
-
-        # where the top and bottom of the pipe is
-        self.top = 0 
-        self.bottom = 0
-        self.PIPE_TOP = pygame.transform.flip(PIPE_IMG, False, True)
-        self.PIPE_BOTTOM = PIPE_IMG
-
-        self.passed = False
-        self.set_height()
-
-    def set_height(self):
-        # set the height of the pipe, from the top of the screen
-
-        self.height = random.randrange(50, 450)
-        self.top = self.height - self.PIPE_TOP.get_height()
-        self.bottom = self.height + self.GAP
-
-    def move(self):
-        self.x -= self.VEL
-
-    def draw(self, win):
-        win.blit(self.PIPE_TOP, (self.x, self.top))
-        win.blit(self.PIPE_BOTTOM, (self.x, self.bottom))
-
-    def collide(self, bird):
-        bird_mask = bird.get_mask()
-        top_mask = pygame.mask.from_surface(self.PIPE_TOP)
-        bottom_mask = pygame.mask.from_surface(self.PIPE_BOTTOM)
-
-        # how far away the bird_mask and top_mask and bird_mask and bottom_mask are
-        top_offset = (self.x - bird.x, self.top - round(bird.y))
-        bottom_offset = (self.x - bird.x, self.bottom - round(bird.y))
-
-        b_point = bird_mask.overlap(bottom_mask, bottom_offset)
-        t_point = bird_mask.overlap(top_mask, top_offset)
-
-        if b_point or t_point:
-            return True
-        return False
-
-
-class Base:
-    VEL = 5
-    WIDTH = BASE_IMG.get_width()
-    IMG = BASE_IMG
-
-    def __init__(self, y):
-        self.y = y
-        self.x1 = 0
-        self.x2 = self.WIDTH
-
-    def move(self):
-        self.x1 -= self.VEL
-        self.x2 -= self.VEL
-
-        if self.x1 + self.WIDTH < 0:
-            self.x1 = self.WIDTH + self.x2
-
-        if self.x2 + self.WIDTH < 0:
-            self.x2 = self.WIDTH + self.x1
-
-    def draw(self, win):
-        win.blit(self.IMG, (self.x1, self.y))
-        win.blit(self.IMG, (self.x2, self.y))
-
-
-def draw_window(win, birds, pipes, base, score, gen, pipe_ind):
-    # draw window
-
-    win.blit(BG_IMG, (0, 0))
-
-    for pipe in pipes:
-        pipe.draw(win)
-
-    text = STAT_FONT.render("Score: " + str(score), 1, (255, 255, 255))
-    win.blit(text, (WIN_WIDTH - 10 - text.get_width(), 10))   
-
-    text = STAT_FONT.render("Gen: " + str(gen), 1, (255, 255, 255))
-    win.blit(text, (10, 10))  
-    
-    score_label = STAT_FONT.render("Alive: " + str(len(birds)),1,(255,255,255))
-    win.blit(score_label, (10, 50))
-
-    base.draw(win)
-
-    for bird in birds:
-        if DRAW_LINES is True:
-            try:
-                pygame.draw.line(win, (255,0,0), (bird.x + bird.img.get_width() / 2, bird.y +
-                                 bird.img.get_height() / 2), (pipes[pipe_ind].x +
-                                 pipes[pipe_ind].PIPE_TOP.get_width() / 2, pipes[pipe_ind].height), 3)
-                pygame.draw.line(win, (255,0,0), (bird.x+bird.img.get_width()/2, bird.y + 
-                                 bird.img.get_height()/2), (pipes[pipe_ind].x +
-                                 pipes[pipe_ind].PIPE_BOTTOM.get_width()/2, pipes[pipe_ind].bottom), 3)
-            except:
-                pass
-        bird.draw(win) # draw bird
-    pygame.display.update()
-
 # def draw_pause_screen(win, base, score):
 #     win.blit(BG_IMG, (0, 0))
 
@@ -337,8 +179,116 @@ def main(genomes, config):
     # fitness function for NEAT
     # also the main function
 
-    global GEN
+    next_episode()
+    if VECTORIZED:
+        evaluate_genomes(genomes, lambda gs: simulate_batch(gs, config, SEEDS))
+    else:
+        evaluate_genomes(genomes, lambda gs: simulate_episodes(gs, config, SEEDS, HEADLESS))
+
+
+def next_episode():
+    # move on to the next generation and pick the episodes it is evaluated on
+    global GEN, SEED, SEEDS
     GEN += 1
+    SEEDS = episode_seeds(EPISODES, EPISODE_SEED)
+    SEED = SEEDS[0]
+
+
+def episode_key():
+    # what a genome's fitness depends on besides the genome, for the cache
+    if len(SEEDS) == 1:
+        return SEED
+    return (tuple(SEEDS), AGGREGATE, QUANTILE)
+
+
+def evaluate_genomes(genomes, simulate_fn):
+    # simulate_fn(genomes) sets the genomes' fitness; with a fitness cache
+    # it only gets the genomes that haven't flown these episodes before
+    if CACHE is None:
+        simulate_fn(genomes)
+    else:
+        CACHE.evaluate(genomes, episode_key(), simulate_fn)
+
+
+def simulate_episodes(genomes, config, seeds, headless):
+    # fly every seed and set each genome's fitness to the aggregate. Only
+    # the first episode is drawn. The episodes that aren't drawn fly
+    # together in one BatchSim like --vectorized, so K episodes don't take
+    # K times as long; networks BatchNetwork can't run fly them one after
+    # the other.
+    results = [[] for _ in genomes] # per genome, its fitness on each episode
+    rest = seeds
+    if not headless:
+        simulate(genomes, config, seeds[0], False)
+        for r, (_, g) in zip(results, genomes):
+            r.append(g.fitness)
+        rest = seeds[1:]
+
+    if len(rest) > 1 and batchable(config):
+        for r, fitness in zip(results, simulate_batch(genomes, config, rest)):
+            r.extend(fitness)
+    else:
+        for seed in rest:
+            simulate(genomes, config, seed, True)
+            for r, (_, g) in zip(results, genomes):
+                r.append(g.fitness)
+
+    for r, (_, g) in zip(results, genomes):
+        g.fitness = aggregate(r, AGGREGATE, QUANTILE)
+
+
+def batchable(config):
+    # whether every network this config can produce runs in BatchNetwork
+    genome_config = config.genome_config
+    return (set(genome_config.activation_options) == {'tanh'} and
+            set(genome_config.aggregation_options) == {'sum'})
+
+
+def simulate_batch(genomes, config, seeds):
+    # same episodes as simulate_episodes, but with every bird's state in
+    # BatchSim arrays. All episodes fly at once, with one bird per genome per
+    # episode, and every network of every episode is evaluated in one
+    # BatchNetwork pass per tick. Returns each genome's fitness on every
+    # episode.
+    n = len(genomes)
+    nets = BatchNetwork([g for _, g in genomes], config, copies=len(seeds))
+    sim = BatchSim(n, assets.bird_masks(), assets.pipe_top_mask(),
+                   assets.pipe_bottom_mask(), [PipeStream(seed) for seed in seeds])
+    sim.profiler = PROFILER
+    if RECORDER:
+        sim.recorder = RECORDER.batch(seeds, n, GEN)
+
+    def decide(idx, inputs):
+        # bird k * n + j flies with copy k of genome j's network, same index
+        return nets.activate(idx, inputs)[:, 0] > 0.5
+
+    LIMITS.start()
+    start = time.perf_counter()
+    while True:
+        done = [LIMITS.reached(sim.ticks, score) for score in sim.score.tolist()]
+        if all(done):
+            break
+        for k in range(len(seeds)):
+            if done[k]:
+                sim.stop(k)
+        if not sim.tick(decide):
+            break
+    EpisodeReporter.add(sim.ticks, sim.bird_ticks, time.perf_counter() - start)
+    if sim.recorder:
+        sim.recorder.end()
+
+    results = sim.fitness.reshape(len(seeds), n).T.tolist()
+    for (_, g), fitness in zip(genomes, results):
+        g.fitness = aggregate(fitness, AGGREGATE, QUANTILE)
+
+    Pipe.narrow_checks += sim.narrow_checks
+    Pipe.skipped_checks += sim.skipped_checks
+    return results
+
+
+def simulate(genomes, config, seed, headless):
+    # play the episode `seed` with a bird for every genome, all on the same
+    # pipes, and set each genome's fitness
     nets = []
     ge = []
     birds = []
@@ -346,71 +296,116 @@ def main(genomes, config):
     for _, g in genomes:
         net = neat.nn.FeedForwardNetwork.create(g, config) # setup a neural network
         nets.append(net)
-        birds.append(Bird(230, 350))
+        birds.append(Bird(230, 350, TRAIN))
         g.fitness = 0
         ge.append(g)
 
-    base = Base(730)
-    pipes = [Pipe(600)]
-    win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-    clock = pygame.time.Clock()
+    heights = iter(PipeStream(seed))
+    pipes = PipeRing(heights)
+    pipes.spawn(600)
+    rec = None
+    if RECORDER:
+        # birds are recorded by their starting slot, they get swapped around below
+        rec = RECORDER.begin(seed, len(birds), GEN)
+        slot = {id(bird): i for i, bird in enumerate(birds)}
+    if not headless:
+        base = Base(730) # only scenery, headless runs don't need it
+        win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+        screen = DirtyRenderer(win)
+        clock = pygame.time.Clock()
+
+    # spectating draws only some ticks or some birds and lets the
+    # simulation run as fast as it can in between
+    spectating = RENDER_EVERY > 1 or SPECTATE_TOP is not None
 
     score = 0
-
+    ticks = 0
+    live_ticks = bird_ticks = 0 # ticks with birds alive, and birds alive summed over them
+    prof = PROFILER
+    LIMITS.start()
+    start = time.perf_counter()
 
     run = True
     while run:
-        clock.tick(45)
-        for event in pygame.event.get():
-            # keys = pygame.key.get_pressed()
-            # if keys[pygame.K_j]:
-            #     bird.jump()
-            if event.type == pygame.QUIT:
-                run = False
-                pygame.QUIT()
-                quit()
-
-        pipe_ind = 0
-        if len(birds) > 0:
-            if len(pipes) > 1 and birds[0].x > pipes[0].x + pipes[0].PIPE_TOP.get_width():
-                # if the bird has passed the 0th index pipe in the list pipes
-                pipe_ind = 1
-        else:
+        if LIMITS.reached(ticks, score):
+            # long enough, keep the fitness earned so far
+            break
+        ticks += 1
+        if prof:
+            prof.mark()
+        draw = not headless and ticks % RENDER_EVERY == 0
+
+        if draw:
+            if not spectating:
+                clock.tick(45)
+            for event in pygame.event.get():
+                # keys = pygame.key.get_pressed()
+                # if keys[pygame.K_j]:
+                #     bird.jump()
+                if event.type == pygame.QUIT:
+                    run = False
+                    pygame.QUIT()
+                    quit()
+
+        if len(birds) == 0:
             run = False
             break 
+        live_ticks += 1
+        bird_ticks += len(birds)
+        if prof:
+            prof.tick(len(birds))
+            prof.lap('draw')
+
+        # if the birds have passed the 0th pipe, look at the next one
+        pipe_ind = pipe_index(birds, pipes)
 
         for x, bird in enumerate(birds):
             bird.move()
             ge[x].fitness += 0.1
+        if prof:
+            prof.lap('move')
 
+        for x, bird in enumerate(birds):
             output = nets[x].activate((bird.y , abs(bird.y - pipes[pipe_ind].top), abs(bird.y -
                                         pipes[pipe_ind].bottom)))
 
             if output[0] > 0.5:
                 bird.jump()
+                if rec:
+                    rec.jump(slot[id(bird)])
+        if prof:
+            prof.lap('activate')
 
         #bird.move()
         add_pipe = False
-        rem = []
+        gone = 0
         for pipe in pipes:
-            for x, bird in enumerate(birds):
-                if pipe.collide(bird):
-                    # favour birds that don't hit the pipe and made it to the same 
-                    # distance then remove the bird and stop tracking it
-
-                    ge[x].fitness -= 1 
-                    birds.pop(x)
-                    nets.pop(x)
-                    ge.pop(x)
-
-                if not pipe.passed and pipe.x < bird.x: # if bird has passed the pipe
+            if birds:
+                if not pipe.passed and pipe.x < birds[0].x: # if bird has passed the pipe
                     pipe.passed = True
                     add_pipe = True
 
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0:
+                if prof:
+                    prof.lap('pipes')
+                    prof.collisions += len(birds)
+                x = 0
+                while x < len(birds):
+                    if pipe.collide(birds[x]):
+                        # favour birds that don't hit the pipe and made it to the same 
+                        # distance then remove the bird and stop tracking it
+                        ge[x].fitness -= 1
+                        if rec:
+                            rec.die(slot[id(birds[x])])
+                        remove_bird(birds, nets, ge, x)
+                    else:
+                        x += 1
+                if prof:
+                    prof.lap('collide')
+
+            if pipe.off_screen():
                 # if the pipe is out of the screen
-                # add it to rem
-                rem.append(pipe)
+                # count it, its slot is recycled below
+                gone += 1
 
             pipe.move()
 
@@ -419,42 +414,391 @@ def main(genomes, config):
                 # reward birds that made it through a pipe without colliding 
                 g.fitness += 5 
             score += 1
-            pipes.append(Pipe(600))
+            pipes.spawn(600)
 
-        for r in rem:
-            # remove all pipes out of the screen
-            pipes.remove(r)
+        # the pipes out of the screen are the oldest ones, free their slots
+        pipes.release(gone)
+        if prof:
+            prof.lap('pipes')
 
-        for x, bird in enumerate(birds):
+        x = 0
+        while x < len(birds):
             # check if the bird hits the base/ground
             # or goes over the screen 
-            if bird.y + bird.img.get_height() >= 730 or bird.y < 0:
-                birds.pop(x)
-                nets.pop(x)
-                ge.pop(x)
-
-        base.move()
-        draw_window(win, birds, pipes, base, score, GEN, pipe_ind)
-
+            if birds[x].out_of_bounds():
+                if rec:
+                    rec.die(slot[id(birds[x])])
+                remove_bird(birds, nets, ge, x)
+            else:
+                x += 1
+        if prof:
+            prof.lap('bounds')
+
+        # the wings keep flapping even headless, the collision mask depends
+        # on the current frame
+        for bird in birds:
+            bird.animate()
+        if rec:
+            rec.end_tick()
+        if prof:
+            prof.lap('animate')
+
+        if not headless:
+            base.move()
+        if draw:
+            shown = birds
+            if SPECTATE_TOP is not None:
+                shown = best_birds(birds, ge, pipes[min(pipe_ind, len(pipes) - 1)], SPECTATE_TOP)
+            draw_window(screen, shown, pipes, base, score, GEN, pipe_ind, DRAW_LINES, len(birds))
+        if prof:
+            prof.lap('draw')
+
+    EpisodeReporter.add(live_ticks, bird_ticks, time.perf_counter() - start)
+    if rec:
+        rec.end()
+
+
+def remove_bird(birds, nets, ge, x):
+    # swap the last bird into slot x and drop the last slot: O(1), and the
+    # while loops above look at slot x again so nobody gets skipped. Bird
+    # order doesn't matter, every bird flies on its own.
+    birds[x] = birds[-1]
+    nets[x] = nets[-1]
+    ge[x] = ge[-1]
+    birds.pop()
+    nets.pop()
+    ge.pop()
+
+
+def best_birds(birds, ge, pipe, k):
+    # the k birds with the highest fitness so far. Birds still alive have
+    # mostly earned the same fitness, so ties go to the bird closest to the
+    # middle of the gap it is flying at.
+    gap = (pipe.height + pipe.bottom) / 2
+    best = heapq.nlargest(k, range(len(birds)),
+                          key=lambda x: (ge[x].fitness, -abs(birds[x].y - gap)))
+    return [birds[x] for x in best]
+
+
+_worker_config = None
+
+def _init_worker(config, limits, profile=False):
+    # keep the config in each worker so it isn't pickled with every genome.
+    # Ctrl-C is for the parent: it writes the checkpoint and terminates the
+    # pool, a worker dying on it would leave its task unfinished forever.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    global _worker_config, LIMITS, PROFILER
+    _worker_config = config
+    LIMITS = limits
+    PROFILER = PhaseProfiler() if profile else None
+
+
+def eval_genome(genome, seed):
+    # fly a single genome headless through episode `seed`; every genome of a
+    # generation gets the same seeds, so they all fly through the same pipes.
+    # Also returns the collision and tick counters so the parent can report
+    # them. With several episodes each one is its own task and the parent
+    # aggregates the fitness.
+    Pipe.narrow_checks = Pipe.skipped_checks = 0
+    EpisodeReporter.ticks = EpisodeReporter.bird_ticks = EpisodeReporter.seconds = 0
+    if PROFILER:
+        PROFILER.reset()
+    simulate([(None, genome)], _worker_config, seed, True)
+    return (genome.fitness, Pipe.narrow_checks, Pipe.skipped_checks,
+            (EpisodeReporter.ticks, EpisodeReporter.bird_ticks, EpisodeReporter.seconds),
+            PROFILER.totals() if PROFILER else None)
+
+
+class ParallelEvaluator:
+    # fitness function that spreads a generation's genomes over a process pool
+
+    def __init__(self, num_workers, config):
+        self.pool = multiprocessing.Pool(num_workers, _init_worker,
+                                         (config, LIMITS, PROFILER is not None))
+
+    def close(self, wait=True):
+        # wait=False drops whatever is still being evaluated
+        if wait:
+            self.pool.close()
+        else:
+            self.pool.terminate()
+        self.pool.join()
+
+    def evaluate(self, genomes, config):
+        next_episode()
+        evaluate_genomes(genomes, self.simulate)
+
+    def simulate(self, genomes):
+        # one task per genome and episode, so neither a long lived bird nor a
+        # genome's K episodes hold up a whole chunk
+        jobs = [self.submit(g) for _, g in genomes]
+        for tasks, (_, g) in zip(jobs, genomes):
+            self.record(g, [task.get() for task in tasks])
+
+    def next_episode(self):
+        # move on to the next generation's episodes, returns their cache key
+        next_episode()
+        return episode_key()
+
+    def submit(self, genome, callback=None, error_callback=None):
+        # start evaluating genome on the current episodes, one task each.
+        # Returns the tasks; callback gets the list of what eval_genome
+        # returned for every episode once they are all back. The callbacks
+        # run one at a time in the pool's result thread.
+        seeds = SEEDS
+        results = [None] * len(seeds)
+        left = len(seeds)
+
+        def done(k, result):
+            nonlocal left
+            results[k] = result
+            left -= 1
+            if left == 0 and callback is not None:
+                callback(results)
+
+        return [self.pool.apply_async(eval_genome, (genome, seed),
+                                      callback=lambda result, k=k: done(k, result),
+                                      error_callback=error_callback)
+                for k, seed in enumerate(seeds)]
+
+    def record(self, genome, results):
+        # results: what eval_genome returned for each episode
+        fitness = []
+        for f, narrow, skipped, ticks, profile in results:
+            fitness.append(f)
+            Pipe.narrow_checks += narrow
+            Pipe.skipped_checks += skipped
+            EpisodeReporter.add(*ticks)
+            if profile:
+                PROFILER.merge(profile)
+        genome.fitness = aggregate(fitness, AGGREGATE, QUANTILE)
+
+
+class EpisodeReporter(neat.reporting.BaseReporter):
+    # prints the generation's episode seed, so it can be replayed, how much
+    # pixel testing the collision broad phase saved and what a tick cost.
+    # A bird tick is one living bird simulated for one tick; time per bird
+    # tick stays flat however many birds have died.
+
+    # summed over the generation's simulations (across workers, too)
+    ticks = 0
+    bird_ticks = 0
+    seconds = 0.0
+
+    @classmethod
+    def add(cls, ticks, bird_ticks, seconds):
+        cls.ticks += ticks
+        cls.bird_ticks += bird_ticks
+        cls.seconds += seconds
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if len(SEEDS) > 1:
+            print("Episode seeds: {0}".format(", ".join(str(seed) for seed in SEEDS)))
+        else:
+            print("Episode seed: {0}".format(SEED))
+        total = Pipe.narrow_checks + Pipe.skipped_checks
+        if total:
+            print("Collision checks: {0} pixel tests, {1} skipped by broad phase ({2:.1%})".format(
+                Pipe.narrow_checks, Pipe.skipped_checks, Pipe.skipped_checks / total))
+        Pipe.narrow_checks = Pipe.skipped_checks = 0
+
+        cls = EpisodeReporter
+        if cls.bird_ticks:
+            print("Simulated {0} ticks, {1} bird ticks in {2:.2f}s ({3:.1f} us per bird tick)".format(
+                cls.ticks, cls.bird_ticks, cls.seconds, cls.seconds / cls.bird_ticks * 1e6))
+        cls.ticks = cls.bird_ticks = 0
+        cls.seconds = 0.0
+
+
+def run(config_path, headless=False, workers=1, vectorized=False, generations=50,
+        checkpoint_every=None, checkpoint_seconds=None, checkpoint_prefix='neat-checkpoint-',
+        resume=None, episode_seed=None, cache_mb=None, max_ticks=None, max_score=None,
+        max_seconds=None, render_every=1, spectate_top=None, profile=None, stats_log=None,
+        champion_path=champion.DEFAULT_PATH, episodes=1, fitness_aggregate='mean', quantile=0.25,
+        reporters=(), quiet=False, asynchronous=False, ready=0.9, record=None):
+    # workers > 1 evaluates genomes in that many processes, which is always headless.
+    # Checkpoints are written every checkpoint_every generations and/or
+    # checkpoint_seconds seconds, and once more on Ctrl-C; resume continues
+    # from one of them until `generations` generations have run in total.
+    # cache_mb enables a fitness cache of that size, which mostly pays off
+    # with a fixed episode_seed. max_ticks, max_score and max_seconds end
+    # each episode early so a generation can't run forever.
+    # render_every and spectate_top turn the window into a spectator view:
+    # only every Nth tick and/or only the K best birds are drawn, and the
+    # simulation isn't held to the frame cap.
+    # profile times each phase of the simulation loop and reports it per
+    # generation; a path (.csv, .json or .jsonl) also appends it there.
+    # stats_log appends a JSON line per generation with the fitness and
+    # species summary to that path.
+    # The best genome found is exported to champion_path (if set) for
+    # flappy_bird.py --autopilot, also when training is interrupted.
+    # episodes > 1 flies every genome through that many episodes per
+    # generation; its fitness is their mean, min or `quantile` quantile.
+    # reporters are added to the population as well; quiet leaves out the
+    # per generation printout.
+    # asynchronous (needs workers > 1) doesn't wait for a generation's last
+    # birds: once `ready` of it is evaluated the next one is bred, see
+    # steady_state.py.
+    # record writes every episode (seed, jumps and deaths) to that replay
+    # file for flappy_bird.py --replay; it needs a single process.
+    global HEADLESS, VECTORIZED, RENDER_EVERY, SPECTATE_TOP, GEN, EPISODE_SEED, CACHE, LIMITS, PROFILER
+    global EPISODES, AGGREGATE, QUANTILE, RECORDER
+    if record and workers > 1:
+        raise ValueError("recording replays needs workers=1, the episodes are flown in one process")
+    if asynchronous and workers <= 1:
+        raise ValueError("asynchronous evaluation needs workers > 1")
+    HEADLESS = headless
+    VECTORIZED = vectorized
+    RENDER_EVERY = max(render_every, 1)
+    SPECTATE_TOP = spectate_top
+    EPISODE_SEED = episode_seed
+    EPISODES = max(episodes, 1)
+    AGGREGATE = fitness_aggregate
+    QUANTILE = quantile
+    CACHE = FitnessCache(int(cache_mb * 1024 * 1024)) if cache_mb else None
+    LIMITS = EpisodeLimits(max_ticks, max_score, max_seconds)
+    PROFILER = None
+    if profile:
+        PROFILER = PhaseProfiler(profile if isinstance(profile, str) else None)
 
-def run(config_path):
     config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction, 
              neat.DefaultSpeciesSet, neat.DefaultStagnation,
              config_path)
 
-    p = neat.Population(config)
-
-    p.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
-    p.add_reporter(stats)
-
-    winner = p.run(main, 50)
+    if resume:
+        p = AtomicCheckpointer.restore_checkpoint(resume, config)
+        GEN = p.generation
+    else:
+        p = neat.Population(config)
+
+    checkpointer = None
+    if checkpoint_every or checkpoint_seconds:
+        checkpointer = AtomicCheckpointer(checkpoint_every, checkpoint_seconds, checkpoint_prefix)
+        p.add_reporter(checkpointer)
+
+    if not quiet:
+        p.add_reporter(neat.StdOutReporter(True))
+        p.add_reporter(EpisodeReporter())
+    for reporter in reporters:
+        p.add_reporter(reporter)
+    if CACHE is not None:
+        p.add_reporter(CACHE)
+    if PROFILER is not None:
+        p.add_reporter(PROFILER)
+    stats = None
+    if stats_log:
+        stats = StatsLog(stats_log)
+        p.add_reporter(stats)
+    RECORDER = Recorder(record) if record else None
+
+    evaluator = None
+    fitness_function = main
+    if workers > 1:
+        evaluator = ParallelEvaluator(workers, config)
+        fitness_function = evaluator.evaluate
+
+    interrupted = False
+    try:
+        if asynchronous:
+            winner = SteadyState(p, evaluator, ready, CACHE).run(max(generations - p.generation, 0))
+        else:
+            winner = p.run(fitness_function, max(generations - p.generation, 0))
+    except KeyboardInterrupt:
+        interrupted = True
+        if checkpointer is not None:
+            # the generation being evaluated gets evaluated again on resume
+            checkpointer.write(p.population, p.species, p.generation)
+        if champion_path and p.best_genome is not None:
+            champion.export(p.best_genome, config, champion_path)
+        raise
+    finally:
+        if evaluator is not None:
+            # nobody is waiting for the tasks still running after Ctrl-C
+            evaluator.close(wait=not (asynchronous or interrupted))
+        if stats is not None:
+            stats.close()
+        if RECORDER is not None:
+            RECORDER.close()
+            RECORDER = None
+
+    if winner is None:
+        # nothing was run, e.g. resuming a checkpoint that is already at `generations`
+        winner = p.best_genome
+    if champion_path and winner is not None:
+        champion.export(winner, config, champion_path)
+        print("Champion saved to {0}".format(champion_path))
+    return winner
 
 if __name__ == "__main__":
     # load config files and pass them to run fucntion
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--headless', action='store_true',
+                        help='train without a window and without the 45 fps cap')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='number of processes evaluating genomes, 0 for one per core')
+    parser.add_argument('--vectorized', action='store_true',
+                        help='simulate the population with numpy arrays (headless)')
+    parser.add_argument('--generations', type=int, default=50,
+                        help='total number of generations to train for')
+    parser.add_argument('--checkpoint-every', type=int, default=None, metavar='N',
+                        help='write a checkpoint every N generations')
+    parser.add_argument('--checkpoint-seconds', type=float, default=None, metavar='T',
+                        help='write a checkpoint at the end of a generation once T seconds have passed')
+    parser.add_argument('--checkpoint-prefix', default='neat-checkpoint-',
+                        help='path prefix of the checkpoint files')
+    parser.add_argument('--resume', metavar='CHECKPOINT',
+                        help='continue training from a checkpoint file')
+    parser.add_argument('--episode-seed', type=int, default=None,
+                        help='evaluate every generation on this episode instead of a new random one')
+    parser.add_argument('--fitness-cache-mb', type=float, default=None, metavar='MB',
+                        help='cache fitness by genome and episode, using at most MB megabytes')
+    parser.add_argument('--max-ticks', type=int, default=None,
+                        help='end an episode after this many simulation ticks')
+    parser.add_argument('--max-score', type=int, default=None,
+                        help='end an episode once this many pipes are passed')
+    parser.add_argument('--max-seconds', type=float, default=None,
+                        help='end an episode after this much wall time')
+    parser.add_argument('--render-every', type=int, default=1, metavar='N',
+                        help='spectate: only draw every Nth tick, without the frame cap')
+    parser.add_argument('--spectate-top', type=int, default=None, metavar='K',
+                        help='spectate: only draw the K fittest birds, without the frame cap')
+    parser.add_argument('--profile', nargs='?', const=True, default=None, metavar='PATH',
+                        help='time each phase of the simulation, optionally appending it to a .csv, .json or .jsonl (JSON lines) file')
+    parser.add_argument('--stats-log', metavar='PATH',
+                        help='append a line of JSON statistics per generation to PATH')
+    parser.add_argument('--champion', default=champion.DEFAULT_PATH, metavar='PATH',
+                        help="where to save the best genome's network, '' to not save it")
+    parser.add_argument('--episodes', type=int, default=1, metavar='K',
+                        help='fly every genome through K episodes per generation')
+    parser.add_argument('--aggregate', choices=AGGREGATES, default='mean',
+                        help='how the fitness of the K episodes is combined')
+    parser.add_argument('--quantile', type=float, default=0.25,
+                        help='the quantile used by --aggregate quantile')
+    parser.add_argument('--async', dest='asynchronous', action='store_true',
+                        help="with workers, breed the next generation without waiting for the slowest birds")
+    parser.add_argument('--ready', type=float, default=0.9,
+                        help='fraction of a generation that has to be evaluated before breeding with --async')
+    parser.add_argument('--record', metavar='PATH',
+                        help='write every episode to a replay file for flappy_bird.py --replay')
+    args = parser.parse_args()
+    if not 0 < args.ready <= 1:
+        parser.error("--ready must be greater than 0 and at most 1")
+    workers = args.workers or multiprocessing.cpu_count()
+    if args.asynchronous and workers <= 1:
+        parser.error("--async needs --workers greater than 1")
+    if args.record and workers > 1:
+        parser.error("--record needs --workers 1, the episodes are flown in one process")
 
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, 'config-feedforward.txt')
-    run(config_path)
+    run(config_path, headless=args.headless, workers=workers, vectorized=args.vectorized,
+        generations=args.generations, checkpoint_every=args.checkpoint_every,
+        checkpoint_seconds=args.checkpoint_seconds, checkpoint_prefix=args.checkpoint_prefix,
+        resume=args.resume, episode_seed=args.episode_seed, cache_mb=args.fitness_cache_mb,
+        max_ticks=args.max_ticks, max_score=args.max_score, max_seconds=args.max_seconds,
+        render_every=args.render_every, spectate_top=args.spectate_top, profile=args.profile,
+        stats_log=args.stats_log, champion_path=args.champion, episodes=args.episodes,
+        fitness_aggregate=args.aggregate, quantile=args.quantile,
+        asynchronous=args.asynchronous, ready=args.ready, record=args.record)
 
 